@@ -1,56 +1,473 @@
+import asyncio
+import functools
+import importlib
+import io
+import itertools
+import json
 import os
+import sys
+import threading
+import time
+from collections import ChainMap
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
-from iot_mcp_server import util
 
-# Load environment variables
-load_dotenv()
+class _LazyModule:
+    """Stand-in for a module that is only imported on first attribute access"""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            # Tools run in worker threads, so the first import must happen only once
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+                module = self._module
+        return getattr(module, attr)
+
+# util (and the HTTP stack behind it) loads on the first tool call rather than at startup
+util = _LazyModule("iot_mcp_server.util")
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder is used without it
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:  # uvloop is optional, the default asyncio loop is used without it
+    uvloop = None
+
+# Load environment variables once; processes spawned from an already configured
+# server inherit them and skip the .env discovery walk. DOTENV_PATH points straight
+# at the file when set.
+if not os.environ.get('MCP_ENV_LOADED'):
+    load_dotenv(dotenv_path=os.environ.get('DOTENV_PATH'), override=False)
+    os.environ['MCP_ENV_LOADED'] = '1'
 
 # Create an MCP server
 mcp = FastMCP("IoT MCP Server")
 
-@mcp.tool()
-def list_products(page_size: int = 100) -> str:
+# Shared worker pool for issuing independent upstream API calls concurrently
+_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="iot-mcp")
+
+# Static output fragments shared by every call
+_SEP20 = "=" * 20
+_SEP60 = "=" * 60
+_SEP80 = "=" * 80
+
+_TSL_NOTES = """
+Notes:
+- TSL definition shows all properties supported by the device
+- Real-time data shows current property values
+- If no real-time data, device may be offline or API endpoint mismatch
+"""
+
+_LATEST_ONLINE_DESC = """Data Source Description:
+- device_update: From device overview API updateTime
+- last_connection: From device detail API lastConnTime (more accurate)
+- location: From location service API locateTime
+- System automatically selects the latest time as final result
+"""
+
+# One property entry of get_device_latest_properties, followed by a blank line
+_PROP_TMPL = "🔹 {name} ({code})\n   ├─ Type: {dtype}\n   ├─ Unit: {unit}\n   └─ Property ID: {pid}\n"
+
+def _label(mapping, code, default=None):
+    """Look up a code's label, treating unhashable codes (the API sends {} for some fields) as unknown"""
+    try:
+        return mapping.get(code, default)
+    except TypeError:
+        return default
+
+# Code-to-label tables for history records
+_DIRECTION_MAP = {1: "Uplink", 2: "Downlink"}
+_SEND_STATUS_MAP = {0: "Not Sent", 1: "Sent", -1: "Send Failed"}
+# Event type codes 0-6 are positional; the API may send them as ints or strings
+_EVENT_TYPE_NAMES = ("Offline", "Online", "Reconnect", "Information", "Alert", "Fault", "Reset")
+_EVENT_TYPE_MAP = {str(code): name for code, name in enumerate(_EVENT_TYPE_NAMES)}
+
+# History records are written straight into one buffer, one template per record
+_DATA_RECORD_TMPL = """
+
+Record #{index}:
+  ID: {id}
+  Direction: {direction_str}
+  Message Type: {msgType}
+  Data Type: {dataType}
+  Created Time: {create_time}
+  Send Time: {send_time}
+  Update Time: {update_time}
+  Send Status: {send_status_str}
+  Raw Data (Base64): {data}
+  Thing Model Data (JSON): {dmData}
+  Ticket: {ticket}
+  Source Type: {sourceType}
+  Extended Data: {ext_data}"""
+
+_EVENT_RECORD_TMPL = """
+
+Event #{index}:
+  ID: {id}
+  Event Type: {evt_type_str}
+  Event Code: {eventCode}
+  Event Name: {eventName}
+  Occurrence Time: {occurrence_time}
+  Output Parameters: {outputData}
+  AB ID: {abId}
+  Packet ID: {packetId}
+  Ticket: {ticket}
+  Extended Data: {ext_data}"""
+
+# Product fields pulled in one pass per product, with their display defaults
+_PRODUCT_FIELDS = (
+    ('productName', 'Unknown'),
+    ('productKey', 'N/A'),
+    ('accessType', None),
+    ('netWay', None),
+    ('dataFmt', None),
+    ('connectPlatform', 'N/A'),
+    ('logoPath', 'None'),
+    ('createTime', None),
+    ('updateTime', None),
+)
+
+_PRODUCT_TMPL = """
+{index}. {name}
+   Product Key: {product_key}
+   Access Type: {access_type_str} ({access_type})
+   Network Way: {net_way_str} ({net_way})
+   Data Format: {data_fmt_str} ({data_fmt})
+   Connect Platform: {connect_platform}
+   Logo Path: {logo_path}
+   Created Time: {create_time}
+   Updated Time: {update_time}
+"""
+
+_PRODUCT_DETAILED_TMPL = _PRODUCT_TMPL + "   Raw Data: {raw}\n"
+
+class _MissingAsNA(dict):
+    """Last lookup layer for templates: any field absent from the API payload renders as N/A"""
+    def __missing__(self, key):
+        return 'N/A'
+
+_NA_FIELDS = _MissingAsNA()
+
+_DEVICE_STATUS_MAP = {1: 'Online'}
+_ACTIVATION_MAP = {1: 'Activated'}
+_VERIFICATION_MAP = {1: 'Verified'}
+_VIRTUAL_MAP = {1: 'Yes'}
+_DETAIL_DATA_FMT_MAP = {3: 'Thing Model'}
+_DETAIL_AUTH_MODE_MAP = {0: 'Dynamic Auth', 1: 'Static Auth'}
+_ONLINE_MAP = {1: 'Online'}
+_ACTIVATED_MARK_MAP = {1: '✓'}
+
+# Device overview fields shown raw in list_devices_formatted, which read as None when absent
+_DEVICE_RAW_FIELDS = (
+    'deviceStatus', 'isActived', 'isVirtual', 'isVerified', 'authMode', 'dataFmt',
+    'createTime', 'activedTime', 'updateTime', 'firstConnTime', 'lastConnTime', 'lastOfflineTime',
+)
+_DEVICE_FIELD_DEFAULTS = _MissingAsNA(dict.fromkeys(_DEVICE_RAW_FIELDS), deviceName='Unknown')
+
+_DEVICE_ROW_TMPL = """
+{index}. {deviceName}
+   Device Key: {deviceKey}
+   Product Key: {productKey}
+   Serial Number: {sn}
+   Status: {status_str} ({deviceStatus})
+   Activated: {activated_str} ({isActived})
+   Virtual Device: {virtual_str} ({isVirtual})
+   Verification Status: {verification_str} ({isVerified})
+   Auth Mode: {auth_mode_str} ({authMode})
+   Data Format: {data_fmt_str} ({dataFmt})
+   Created Time: {formattedCreateTime}
+   Activated Time: {formattedActivedTime}
+   First Connection Time: {formattedFirstConnTime}
+   Last Connection Time: {formattedLastConnTime}
+   Last Offline Time: {formattedLastOfflineTime}
+   Last Update: {formattedUpdateTime}
+   Raw Timestamps: Created={createTime}, Activated={activedTime}, Updated={updateTime}, First Connection={firstConnTime}, Last Connection={lastConnTime}, Last Offline={lastOfflineTime}
+"""
+
+_DEVICE_DETAIL_TMPL = """
+Device Detailed Information (Enhanced Detail API):
+==========================================
+Basic Information:
+Device Name: {deviceName}
+Device Key: {deviceKey}
+Serial Number: {sn}
+Product Key: {productKey}
+
+Status Information:
+Device Status: {deviceStatus} ({status_str})
+Activation Status: {activation_str}
+Verification Status: {verification_str}
+Virtual Device: {virtual_str}
+
+Time Information (UTC and UTC+8 timezone):
+Created Time: {formattedCreateTime}
+Activated Time: {formattedActivedTime}
+First Connection: {formattedFirstConnTime}
+Last Connection: {formattedLastConnTime}
+Last Offline: {formattedLastOfflineTime}
+Data Update: {formattedUpdateTime}
+
+Technical Parameters:
+Data Format: {dataFmt} ({data_fmt_str})
+Auth Mode: {authMode} ({auth_mode_str})
+
+Raw Timestamps:
+Created: {createTime}
+Activated: {activedTime}
+First Connection: {firstConnTime}
+Last Connection: {lastConnTime}
+Last Offline: {lastOfflineTime}
+Updated: {updateTime}
+"""
+
+_DEVICE_RESOURCE_TMPL = """Resource Information:
+ICCID: {iccId}
+Phone Number: {phoneNum}
+SIM Number: {simNum}
+Battery Level: {battery}
+Signal Strength: {signalStrength}
+RSRP: {rsrp}
+RSRQ: {rsrq}
+SNR: {snr}
+MCU Version: {mcuVersion}
+SDK Version: {sdkVer}
+Firmware Version: {version}
+Voltage: {voltage}
+Free Memory: {memoryFree}
+Communication Protocol Version: {comProtocolVer}
+Data Protocol Version: {dataProtocolVer}
+Locator: {locator}
+Log Enable: {logEnable}
+Log Level: {logLevel}
+Mobile Country Code (MCC): {mcc}
+Mobile Network Code (MNC): {mnc}
+Cell ID: {cellId}
+Location Area Code (LAC): {lac}
+"""
+
+_DEVICE_RESOURCE_MISSING_TMPL = """Resource Information:
+Unable to retrieve device resource information. Raw response: {raw}
+"""
+
+class _TTLCache:
+    """Small thread-safe cache whose entries expire a fixed number of seconds after being stored"""
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        # Caller holds self._lock
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] >= self.ttl:
+            del self._data[key]
+            return None
+        # Move the hit to the back so eviction drops the least recently used entry
+        self._data[key] = self._data.pop(key)
+        return entry[1]
+
+    def get(self, key):
+        with self._lock:
+            return self._lookup(key)
+
+    def get_or_load(self, key, loader):
+        """Return the cached value, calling loader() on a miss; concurrent misses share one call"""
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            future = self._inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = self._inflight[key] = Future()
+        
+        if not is_owner:
+            return future.result()
+        
+        # Failures propagate to every waiter and are never cached
+        try:
+            value = loader()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def set(self, key, value):
+        with self._lock:
+            # Evict the least recently used entry once full
+            if key not in self._data and len(self._data) >= self.maxsize:
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = (time.monotonic(), value)
+
+    def pop(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def pop_matching(self, predicate):
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            count = len(self._data)
+            self._data.clear()
+            return count
+
+# Product TSL definitions and thing models change rarely; keep them for an hour
+# per product unless ACC_MCP_PRODUCT_TTL (seconds) says otherwise
+_PRODUCT_TTL = float(os.environ.get('ACC_MCP_PRODUCT_TTL', 3600))
+_tsl_cache = _TTLCache(maxsize=256, ttl=_PRODUCT_TTL)
+_thing_model_cache = _TTLCache(maxsize=256, ttl=_PRODUCT_TTL)
+
+# Coalesces list_products/list_products_detailed calls made within a minute
+_products_cache = _TTLCache(maxsize=8, ttl=60)
+
+# Device details are re-read often within one conversation; 30 s keeps status fresh
+_device_detail_cache = _TTLCache(maxsize=2048, ttl=30)
+
+# Absorbs repeated polling of a device's latest online time; kept short (10 s by
+# default, ACC_MCP_ONLINE_TTL overrides) so answers stay fresh
+_online_time_cache = _TTLCache(maxsize=10000, ttl=float(os.environ.get('ACC_MCP_ONLINE_TTL', 10)))
+
+def _to_json(obj):
+    """Serialize an API payload for a tool response; plain status strings pass through"""
+    if isinstance(obj, str):
+        return obj
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, default=str, indent=2, ensure_ascii=False)
+
+def _cached_tsl(product_key):
+    """Get product TSL definition, reusing a cached copy while it is still fresh"""
+    return _tsl_cache.get_or_load(product_key, lambda: util.get_product_tsl_json(product_key))
+
+def _cached_thing_model(product_id, product_key, language):
+    """Get product thing model, reusing a cached copy while it is still fresh"""
+    return _thing_model_cache.get_or_load(
+        (product_id, product_key, language),
+        lambda: util.get_product_thing_model(product_id=product_id, product_key=product_key, language=language),
+    )
+
+def _cached_device_detail(product_key, device_key):
+    """Get device detail, reusing a copy fetched within the last 30 seconds"""
+    return _device_detail_cache.get_or_load(
+        (product_key, device_key),
+        lambda: util.get_device_detail(product_key, device_key),
+    )
+
+def _clear_tsl_cache(product_key=None):
+    """Drop one product's cached TSL definition and thing models, or all of them when no product key is given"""
+    if product_key is None:
+        _thing_model_cache.clear()
+        return _tsl_cache.clear()
+    _thing_model_cache.pop_matching(lambda key: key[1] == product_key)
+    return 1 if _tsl_cache.pop(product_key) else 0
+
+def _cached_list_products(page_size):
+    """Get all products, reusing the result of an identical query made within the last minute"""
+    return _products_cache.get_or_load(page_size, lambda: util.list_products(page_size=page_size))
+
+def _run_in_thread(func):
     """
-    List all products in the IoT platform with pagination support
+    Run a blocking tool in a worker thread
     
-    Args:
-        page_size: Number of products per page (default: 100)
+    FastMCP calls synchronous tools directly on its event loop, so a slow upstream
+    request would stall every other client; as a coroutine the loop stays free.
     """
-    products = util.list_products(page_size=page_size)
-    
-    if isinstance(products, str):  # Error case
-        return products
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return wrapper
+
+def _report_api_errors(func):
+    """Return IoTApiError raised while serving a tool call as the tool's error text"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except util.IoTApiError as e:
+            return f"Error: {e}"
+    return wrapper
+
+def _format_product(index, product, template):
+    """Render one product entry, reading each field from the product dict only once"""
+    get = product.get
+    (name, product_key, access_type, net_way, data_fmt,
+     connect_platform, logo_path, create_time, update_time) = [get(key, default) for key, default in _PRODUCT_FIELDS]
+    fmt_ts = util.format_timestamp_with_timezone
     
+    return template.format(
+        index=index,
+        name=name,
+        product_key=product_key,
+        access_type_str=util.format_access_type(access_type),
+        access_type=access_type,
+        net_way_str=util.format_network_way(net_way),
+        net_way=net_way,
+        data_fmt_str=util.format_data_fmt(data_fmt),
+        data_fmt=data_fmt,
+        connect_platform=connect_platform,
+        logo_path=logo_path,
+        create_time=fmt_ts(create_time) if create_time else 'N/A',
+        update_time=fmt_ts(update_time) if update_time else 'N/A',
+        raw=product,
+    )
+
+def _render_products(products, verbose):
+    """Render the product list for list_products, or list_products_detailed when verbose"""
     if not products:
         return "No products found in your account."
     
     # Format product list with detailed information
-    product_list = []
-    product_list.append(f"Product list (total: {len(products)} products):")
-    product_list.append("=" * 60)
-    
-    for i, product in enumerate(products, 1):
-        # Format creation and update time
-        create_time = util.format_timestamp_with_timezone(product.get('createTime'))
-        update_time = util.format_timestamp_with_timezone(product.get('updateTime'))
-        
-        product_info = f"""
-{i}. {product.get('productName', 'Unknown')}
-   Product Key: {product.get('productKey', 'N/A')}
-   Access Type: {util.format_access_type(product.get('accessType'))} ({product.get('accessType')})
-   Network Way: {util.format_network_way(product.get('netWay'))} ({product.get('netWay')})
-   Data Format: {util.format_data_fmt(product.get('dataFmt'))} ({product.get('dataFmt')})
-   Connect Platform: {product.get('connectPlatform', 'N/A')}
-   Logo Path: {product.get('logoPath', 'None')}
-   Created Time: {create_time}
-   Updated Time: {update_time}
-"""
-        product_list.append(product_info)
+    if verbose:
+        product_list = [f"Detailed Product List (total: {len(products)} products):", _SEP80]
+        template = _PRODUCT_DETAILED_TMPL
+    else:
+        product_list = [f"Product list (total: {len(products)} products):", _SEP60]
+        template = _PRODUCT_TMPL
+    product_list.extend(_format_product(i, product, template) for i, product in enumerate(products, 1))
     
     return "\n".join(product_list)
 
 @mcp.tool()
+@_run_in_thread
+@_report_api_errors
+def list_products(page_size: int = 100) -> str:
+    """
+    List all products in the IoT platform with pagination support
+    
+    Args:
+        page_size: Number of products per page (default: 100)
+    """
+    products = _cached_list_products(page_size)
+    return _render_products(products, verbose=False)
+
+@mcp.tool()
+@_run_in_thread
+@_report_api_errors
 def list_products_detailed(page_size: int = 100) -> str:
     """
     List all products with detailed formatting and pagination support - shows comprehensive product information
@@ -58,47 +475,35 @@ def list_products_detailed(page_size: int = 100) -> str:
     Args:
         page_size: Number of products per page (default: 100)
     """
-    products = util.list_products(page_size=page_size)
-    
-    if isinstance(products, str):  # Error case
-        return products
-    
-    if not products:
-        return "No products found in your account."
-    
-    # Format product list with detailed information
-    product_list = []
-    product_list.append(f"Detailed Product List (total: {len(products)} products):")
-    product_list.append("=" * 80)
-    
-    for i, product in enumerate(products, 1):
-        # Format creation and update time
-        create_time = util.format_timestamp_with_timezone(product.get('createTime'))
-        update_time = util.format_timestamp_with_timezone(product.get('updateTime'))
-        
-        product_info = f"""
-{i}. {product.get('productName', 'Unknown')}
-   Product Key: {product.get('productKey', 'N/A')}
-   Access Type: {util.format_access_type(product.get('accessType'))} ({product.get('accessType')})
-   Network Way: {util.format_network_way(product.get('netWay'))} ({product.get('netWay')})
-   Data Format: {util.format_data_fmt(product.get('dataFmt'))} ({product.get('dataFmt')})
-   Connect Platform: {product.get('connectPlatform', 'N/A')}
-   Logo Path: {product.get('logoPath', 'None')}
-   Created Time: {create_time}
-   Updated Time: {update_time}
-   Raw Data: {product}
-"""
-        product_list.append(product_info)
-    
-    return "\n".join(product_list)
+    products = _cached_list_products(page_size)
+    return _render_products(products, verbose=True)
 
 @mcp.tool()
+@_run_in_thread
+@_report_api_errors
 def get_product_definition(product_key: str) -> str:
     """Get product TSL (Thing Specification Language) definition by productKey"""
-    tsl_json = util.get_product_tsl_json(product_key)
-    return str(tsl_json)
+    tsl_json = _cached_tsl(product_key)
+    return _to_json(tsl_json)
+
+@mcp.tool()
+def refresh_tsl_cache(product_key: str = None) -> str:
+    """
+    Clear cached product TSL definitions and thing models so the next query fetches them again
+    
+    Args:
+        product_key: Only clear the cache for this product (default: clear all)
+    """
+    cleared = _clear_tsl_cache(product_key)
+    if product_key:
+        if cleared:
+            return f"Cleared cached TSL definition for product {product_key}"
+        return f"No cached TSL definition for product {product_key}"
+    return f"Cleared {cleared} cached TSL definitions"
 
 @mcp.tool()
+@_run_in_thread
+@_report_api_errors
 def get_product_thing_model(product_id: int = None, product_key: str = None, language: str = 'CN') -> str:
     """
     Get product thing model (JSON format) by product ID or product Key
@@ -108,190 +513,225 @@ def get_product_thing_model(product_id: int = None, product_key: str = None, lan
         product_key: Product Key
         language: Language setting CN/EN (default: CN)
     """
-    thing_model = util.get_product_thing_model(product_id=product_id, product_key=product_key, language=language)
-    return str(thing_model)
+    thing_model = _cached_thing_model(product_id, product_key, language)
+    return _to_json(thing_model)
 
 @mcp.tool()
+@_run_in_thread
+@_report_api_errors
 def list_devices(product_key: str) -> str:
     """List ALL devices in a product (with automatic pagination)"""
     devices = util.list_devices(product_key)
-    return str(devices)
+    return _to_json(devices)
+
+# Upper bound on devices per list_device_details call, keeping responses to a readable size
+_DEVICE_DETAILS_MAX_LIMIT = 200
 
 @mcp.tool()
+@_run_in_thread
+@_report_api_errors
+def list_device_details(product_key: str, offset: int = 0, limit: int = 50) -> str:
+    """
+    Get the detail records of a product's devices, one window at a time (details are fetched concurrently)
+    
+    Args:
+        product_key: Product key
+        offset: Number of devices to skip in listing order (default: 0)
+        limit: Devices per call, at most 200 (default: 50)
+    
+    Returns:
+        JSON with the device details of this window and the offset of the next one
+        (null when there are no more devices)
+    """
+    offset = max(offset, 0)
+    limit = min(max(limit, 1), _DEVICE_DETAILS_MAX_LIMIT)
+    # List one device past the window to learn whether another window follows
+    devices = util.iter_devices(product_key)
+    try:
+        device_keys = [device.get('deviceKey') for device in itertools.islice(devices, offset, offset + limit + 1)]
+    finally:
+        devices.close()
+    has_more = len(device_keys) > limit
+    return _to_json({
+        'offset': offset,
+        'limit': limit,
+        'next_offset': offset + limit if has_more else None,
+        'devices': util.fetch_device_details(product_key, device_keys[:limit]),
+    })
+
+def _format_device(index, device):
+    """Render one device entry of list_devices_formatted"""
+    get = device.get
+    labels = {
+        'index': index,
+        'status_str': _label(_ONLINE_MAP, get('deviceStatus'), 'Offline'),
+        'activated_str': _label(_ACTIVATED_MARK_MAP, get('isActived'), '✗'),
+        'virtual_str': _label(_VIRTUAL_MAP, get('isVirtual'), 'No'),
+        'verification_str': _label(_VERIFICATION_MAP, get('isVerified'), 'Not Verified'),
+        'auth_mode_str': util.format_auth_mode(get('authMode')),
+        'data_fmt_str': util.format_data_fmt(get('dataFmt')),
+    }
+    return _DEVICE_ROW_TMPL.format_map(ChainMap(labels, device, _DEVICE_FIELD_DEFAULTS))
+
+@mcp.tool()
+@_run_in_thread
+@_report_api_errors
 def list_devices_formatted(product_key: str) -> str:
     """List ALL devices with formatted time display (corrected timezone, with pagination)"""
-    devices = util.list_devices_with_formatted_time(product_key)
-    
-    if isinstance(devices, str):  # Error case
-        return devices
+    # Render devices page by page so raw records are released as soon as they are formatted
+    device_list = []
+    device_count = 0
+    for page_devices in util.iter_device_pages_with_formatted_time(product_key):
+        device_list.extend(_format_device(i, device) for i, device in enumerate(page_devices, device_count + 1))
+        device_count += len(page_devices)
     
-    if not devices:
+    if not device_count:
         return f"No devices found for product key: {product_key}"
     
     # Format device list with correct timezone
-    device_list = []
-    device_list.append(f"Device list for product {product_key} (total: {len(devices)} devices):")
-    device_list.append("=" * 60)
-    
-    for i, device in enumerate(devices, 1):
-        device_info = f"""
-{i}. {device.get('deviceName', 'Unknown')}
-   Device Key: {device.get('deviceKey', 'N/A')}
-   Product Key: {device.get('productKey', 'N/A')}
-   Serial Number: {device.get('sn', 'N/A')}
-   Status: {'Online' if device.get('deviceStatus') == 1 else 'Offline'} ({device.get('deviceStatus')})
-   Activated: {'✓' if device.get('isActived') == 1 else '✗'} ({device.get('isActived')})
-   Virtual Device: {'Yes' if device.get('isVirtual') == 1 else 'No'} ({device.get('isVirtual')})
-   Verification Status: {'Verified' if device.get('isVerified') == 1 else 'Not Verified'} ({device.get('isVerified')})
-   Auth Mode: {util.format_auth_mode(device.get('authMode'))} ({device.get('authMode')})
-   Data Format: {util.format_data_fmt(device.get('dataFmt'))} ({device.get('dataFmt')})
-   Created Time: {device.get('formattedCreateTime', 'N/A')}
-   Activated Time: {device.get('formattedActivedTime', 'N/A')}
-   First Connection Time: {device.get('formattedFirstConnTime', 'N/A')}
-   Last Connection Time: {device.get('formattedLastConnTime', 'N/A')}
-   Last Offline Time: {device.get('formattedLastOfflineTime', 'N/A')}
-   Last Update: {device.get('formattedUpdateTime', 'N/A')}
-   Raw Timestamps: Created={device.get('createTime')}, Activated={device.get('activedTime')}, Updated={device.get('updateTime')}, First Connection={device.get('firstConnTime')}, Last Connection={device.get('lastConnTime')}, Last Offline={device.get('lastOfflineTime')}
-"""
-        device_list.append(device_info)
+    device_list[:0] = [
+        f"Device list for product {product_key} (total: {device_count} devices):",
+        _SEP60,
+    ]
     
     return "\n".join(device_list)
 
 @mcp.tool()
+@_run_in_thread
+@_report_api_errors
 def get_device_details(product_key: str, device_key: str) -> str:
     """Get comprehensive device details using the new detail API, including resource info like ICCID"""
-    device_detail = util.get_device_detail(product_key, device_key)
+    # Detail and resources are independent requests, so fetch them in parallel
+    detail_future = _POOL.submit(_cached_device_detail, product_key, device_key)
+    resources_future = _POOL.submit(util.query_device_resources, product_key, device_key)
+    device_detail = detail_future.result()
     
-    if isinstance(device_detail, str):
-        return device_detail
-    
-    device_resources = util.query_device_resources(product_key, device_key)
+    try:
+        device_resources = resources_future.result()
+    except util.IoTApiError as e:
+        device_resources = f"Error: {e}"
 
     # Format comprehensive device information
-    device_info = f"""
-Device Detailed Information (Enhanced Detail API):
-==========================================
-Basic Information:
-Device Name: {device_detail.get('deviceName', 'N/A')}
-Device Key: {device_detail.get('deviceKey', 'N/A')}
-Serial Number: {device_detail.get('sn', 'N/A')}
-Product Key: {device_detail.get('productKey', 'N/A')}
-
-Status Information:
-Device Status: {device_detail.get('deviceStatus', 'N/A')} ({'Online' if device_detail.get('deviceStatus') == 1 else '🔴 Offline'})
-Activation Status: {'Activated' if device_detail.get('isActived') == 1 else 'Not Activated'}
-Verification Status: {'Verified' if device_detail.get('isVerified') == 1 else 'Not Verified'}
-Virtual Device: {'Yes' if device_detail.get('isVirtual') == 1 else 'No'}
-
-Time Information (UTC and UTC+8 timezone):
-Created Time: {device_detail.get('formattedCreateTime', 'N/A')}
-Activated Time: {device_detail.get('formattedActivedTime', 'N/A')}
-First Connection: {device_detail.get('formattedFirstConnTime', 'N/A')}
-Last Connection: {device_detail.get('formattedLastConnTime', 'N/A')}
-Last Offline: {device_detail.get('formattedLastOfflineTime', 'N/A')}
-Data Update: {device_detail.get('formattedUpdateTime', 'N/A')}
-
-Technical Parameters:
-Data Format: {device_detail.get('dataFmt', 'N/A')} ({'Thing Model' if device_detail.get('dataFmt') == 3 else 'Transparent Transmission'})
-Auth Mode: {device_detail.get('authMode', 'N/A')} ({'Dynamic Auth' if device_detail.get('authMode') == 0 else 'Static Auth' if device_detail.get('authMode') == 1 else 'X509 Auth'})
-
-Raw Timestamps:
-Created: {device_detail.get('createTime', 'N/A')}
-Activated: {device_detail.get('activedTime', 'N/A')}
-First Connection: {device_detail.get('firstConnTime', 'N/A')}
-Last Connection: {device_detail.get('lastConnTime', 'N/A')}
-Last Offline: {device_detail.get('lastOfflineTime', 'N/A')}
-Updated: {device_detail.get('updateTime', 'N/A')}
-"""
+    get = device_detail.get
+    labels = {
+        'status_str': _label(_DEVICE_STATUS_MAP, get('deviceStatus'), '🔴 Offline'),
+        'activation_str': _label(_ACTIVATION_MAP, get('isActived'), 'Not Activated'),
+        'verification_str': _label(_VERIFICATION_MAP, get('isVerified'), 'Not Verified'),
+        'virtual_str': _label(_VIRTUAL_MAP, get('isVirtual'), 'No'),
+        'data_fmt_str': _label(_DETAIL_DATA_FMT_MAP, get('dataFmt'), 'Transparent Transmission'),
+        'auth_mode_str': _label(_DETAIL_AUTH_MODE_MAP, get('authMode'), 'X509 Auth'),
+    }
+    detail_str = _DEVICE_DETAIL_TMPL.format_map(ChainMap(labels, device_detail, _NA_FIELDS))
     
     if isinstance(device_resources, dict) and device_resources:
-        device_info += f"""
-Resource Information:
-ICCID: {device_resources.get('iccId', 'N/A')}
-Phone Number: {device_resources.get('phoneNum', 'N/A')}
-SIM Number: {device_resources.get('simNum', 'N/A')}
-Battery Level: {device_resources.get('battery', 'N/A')}
-Signal Strength: {device_resources.get('signalStrength', 'N/A')}
-RSRP: {device_resources.get('rsrp', 'N/A')}
-RSRQ: {device_resources.get('rsrq', 'N/A')}
-SNR: {device_resources.get('snr', 'N/A')}
-MCU Version: {device_resources.get('mcuVersion', 'N/A')}
-SDK Version: {device_resources.get('sdkVer', 'N/A')}
-Firmware Version: {device_resources.get('version', 'N/A')}
-Voltage: {device_resources.get('voltage', 'N/A')}
-Free Memory: {device_resources.get('memoryFree', 'N/A')}
-Communication Protocol Version: {device_resources.get('comProtocolVer', 'N/A')}
-Data Protocol Version: {device_resources.get('dataProtocolVer', 'N/A')}
-Locator: {device_resources.get('locator', 'N/A')}
-Log Enable: {device_resources.get('logEnable', 'N/A')}
-Log Level: {device_resources.get('logLevel', 'N/A')}
-Mobile Country Code (MCC): {device_resources.get('mcc', 'N/A')}
-Mobile Network Code (MNC): {device_resources.get('mnc', 'N/A')}
-Cell ID: {device_resources.get('cellId', 'N/A')}
-Location Area Code (LAC): {device_resources.get('lac', 'N/A')}
-"""
+        resource_str = _DEVICE_RESOURCE_TMPL.format_map(ChainMap(device_resources, _NA_FIELDS))
     else:
-        device_info += f"""
-Resource Information:
-Unable to retrieve device resource information. Raw response: {device_resources}
-"""
+        resource_str = _DEVICE_RESOURCE_MISSING_TMPL.format(raw=device_resources)
     
-    return device_info
+    return "\n".join([detail_str, resource_str])
+
+def _tsl_summary_lines(tsl_definition):
+    """Render the TSL definition summary of get_device_tsl_properties"""
+    if isinstance(tsl_definition, dict) and 'properties' in tsl_definition:
+        properties = tsl_definition['properties']
+        lines = [f"Supported Properties Count: {len(properties)}\n", "Property List:\n"]
+        for prop in properties:
+            unit = prop.get('specs', {}).get('unit', '')
+            lines.append(f"  - {prop.get('name', 'N/A')} ({prop.get('code', 'N/A')}) [{unit}]\n")
+        return lines
+    return ["Unable to get TSL definition\n"]
+
+def _realtime_property_lines(properties_data):
+    """Render the real-time property values of get_device_tsl_properties"""
+    if isinstance(properties_data, dict):
+        return [f"  - {key}: {value}\n" for key, value in properties_data.items()]
+    if isinstance(properties_data, str):
+        return [f"Status: {properties_data}\n"]
+    return ["No real-time property data\n"]
+
+def _query_device_properties_or_status(product_key, device_key):
+    """Query real-time properties, turning an API error into a status string"""
+    try:
+        return util.query_device_properties(product_key, device_key)
+    except util.IoTApiError as e:
+        return str(e)
 
 @mcp.tool()
+@_run_in_thread
 def get_device_tsl_properties(product_key: str, device_key: str) -> str:
     """Query device TSL property data (temperature, humidity, etc.)"""
     
-    # First get product TSL definition
-    tsl_definition = util.get_product_tsl_json(product_key)
-    
-    # Then query device real-time properties
-    properties_data = util.query_device_properties(product_key, device_key)
+    # Get product TSL definition and device real-time properties in parallel
+    tsl_future = _POOL.submit(_cached_tsl, product_key)
+    properties_future = _POOL.submit(_query_device_properties_or_status, product_key, device_key)
+    try:
+        tsl_definition = tsl_future.result()
+    except util.IoTApiError:
+        tsl_definition = None
+    properties_data = properties_future.result()
     
-    info = f"""
+    info = [f"""
 Device TSL Property Data Query:
 ========================
 Device Key: {device_key}
 Product Key: {product_key}
 
 TSL Definition Summary:
-"""
+"""]
+    info.extend(_tsl_summary_lines(tsl_definition))
+    info.append("\nReal-time Property Data:\n")
+    info.extend(_realtime_property_lines(properties_data))
+    info.append(_TSL_NOTES)
     
-    # Parse TSL definition
-    if isinstance(tsl_definition, dict) and 'properties' in tsl_definition:
-        properties = tsl_definition['properties']
-        info += f"Supported Properties Count: {len(properties)}\n"
-        info += "Property List:\n"
-        for prop in properties:
-            unit = prop.get('specs', {}).get('unit', '')
-            info += f"  - {prop.get('name', 'N/A')} ({prop.get('code', 'N/A')}) [{unit}]\n"
-    else:
-        info += "Unable to get TSL definition\n"
+    return "".join(info)
+
+@mcp.tool()
+@_run_in_thread
+def batch_get_device_tsl_properties(product_key: str, device_keys: list[str]) -> str:
+    """
+    Query TSL property data for several devices of one product in a single call
     
-    info += f"\nReal-time Property Data:\n"
+    Args:
+        product_key: Product key shared by all devices
+        device_keys: Device keys to query
+    """
+    # The TSL definition is fetched once; device queries fan out across the worker pool
+    tsl_future = _POOL.submit(_cached_tsl, product_key)
+    properties_futures = [
+        _POOL.submit(_query_device_properties_or_status, product_key, device_key)
+        for device_key in device_keys
+    ]
+    try:
+        tsl_definition = tsl_future.result()
+    except util.IoTApiError:
+        tsl_definition = None
     
-    # Display real-time property data
-    if isinstance(properties_data, dict):
-        for key, value in properties_data.items():
-            info += f"  - {key}: {value}\n"
-    elif isinstance(properties_data, str):
-        info += f"Status: {properties_data}\n"
-    else:
-        info += "No real-time property data\n"
+    info = [f"""
+Batch Device TSL Property Data Query:
+========================
+Product Key: {product_key}
+Device Count: {len(device_keys)}
+
+TSL Definition Summary:
+"""]
+    info.extend(_tsl_summary_lines(tsl_definition))
     
-    info += f"""
-Notes:
-- TSL definition shows all properties supported by the device
-- Real-time data shows current property values
-- If no real-time data, device may be offline or API endpoint mismatch
-"""
+    for device_key, properties_future in zip(device_keys, properties_futures):
+        info.append(f"\nReal-time Property Data ({device_key}):\n")
+        info.extend(_realtime_property_lines(properties_future.result()))
+    
+    info.append(_TSL_NOTES)
     
-    return info
+    return "".join(info)
 
 @mcp.tool()
+@_run_in_thread
 def get_device_latest_online_time(product_key: str, device_key: str) -> str:
     """Get the most accurate latest online time (enhanced with detail API)"""
-    result = util.get_device_latest_online_time(product_key, device_key)
+    result = _online_time_cache.get_or_load(
+        (product_key, device_key),
+        lambda: util.get_device_latest_online_time(product_key, device_key),
+    )
     
     info = f"""
 Device Latest Online Time Analysis (Enhanced):
@@ -307,17 +747,13 @@ Final Result:
 - Latest Online Time: {util.format_timestamp_with_timezone(result['latestTime']) if result['latestTime'] else 'N/A'}
 - Data Source: {result['source']}
 - Raw Timestamp: {result['latestTime']}
-
-Data Source Description:
-- device_update: From device overview API updateTime
-- last_connection: From device detail API lastConnTime (more accurate)
-- location: From location service API locateTime
-- System automatically selects the latest time as final result
 """
     
-    return info
+    return "\n".join([info, _LATEST_ONLINE_DESC])
 
 @mcp.tool()
+@_run_in_thread
+@_report_api_errors
 def power_switch(product_key: str, device_key: str, on_off: str) -> str:
     """
     Turn the device power switch on or off
@@ -328,9 +764,11 @@ def power_switch(product_key: str, device_key: str, on_off: str) -> str:
         on_off: "on" to turn on, "off" to turn off
     """
     result = util.power_switch(product_key, device_key, on_off)
-    return str(result)
+    return _to_json(result)
 
 @mcp.tool()
+@_run_in_thread
+@_report_api_errors
 def query_device_location(product_key: str = None, device_key: str = None, device_id: int = None, language: str = 'CN') -> str:
     """
     Query latest device location data with corrected timezone
@@ -351,13 +789,12 @@ def query_device_location(product_key: str = None, device_key: str = None, devic
         language=language
     )
     
-    if isinstance(location_data, str):
-        return location_data
-    
     formatted_location = util.format_location_data(location_data)
     return formatted_location
 
 @mcp.tool()
+@_run_in_thread
+@_report_api_errors
 def get_device_location_raw(product_key: str = None, device_key: str = None, device_id: int = None, language: str = 'CN') -> str:
     """
     Get raw device location data with timezone information
@@ -378,9 +815,11 @@ def get_device_location_raw(product_key: str = None, device_key: str = None, dev
         language=language
     )
     
-    return str(location_data)
+    return _to_json(location_data)
 
 @mcp.tool()
+@_run_in_thread
+@_report_api_errors
 def query_device_resources(product_key: str, device_key: str, language: str = 'CN') -> str:
     """
     Query device resources (e.g., battery, signal strength, memory)
@@ -392,21 +831,20 @@ def query_device_resources(product_key: str, device_key: str, language: str = 'C
     """
     resources = util.query_device_resources(product_key, device_key, language)
     
-    if isinstance(resources, str):
-        return resources
-    
     if not resources:
         return "No device resources found or an error occurred."
         
     formatted_output = []
     formatted_output.append("Device Resource Information:")
-    formatted_output.append("=" * 20)
+    formatted_output.append(_SEP20)
     for key, value in resources.items():
         formatted_output.append(f"{key}: {value}")
     
     return "\n".join(formatted_output)
 
 @mcp.tool()
+@_run_in_thread
+@_report_api_errors
 def get_device_data_history(
     product_key: str,
     device_key: str,
@@ -447,9 +885,6 @@ def get_device_data_history(
         send_status=send_status
     )
 
-    if isinstance(history_data, str) and history_data.startswith("Error"):
-        return history_data
-
     if not isinstance(history_data, dict) or "data" not in history_data:
         return f"Error: Unexpected response format from API: {str(history_data)}"
 
@@ -468,51 +903,45 @@ def get_device_data_history(
     if isinstance(total_items, dict): total_items = total_items.get('value', 'N/A')
 
 
-    output = [
+    header = "\n".join([
         f"Device Historical Data Records (Device: {device_key}, Product: {product_key})",
         f"===================================================================",
         f"Pagination Info: Page {current_page_num} / Total {total_pages} pages ({items_per_page} items per page, Total {total_items} items)",
         f"-------------------------------------------------------------------"
-    ]
+    ])
 
     if not data_entries:
-        output.append("No historical data found for the given criteria.")
-        return "\n".join(output)
+        return f"{header}\nNo historical data found for the given criteria."
 
+    buf = io.StringIO()
+    buf.write(header)
+    fmt_ts = util.format_timestamp_with_timezone
     for i, entry in enumerate(data_entries, 1):
-        direction_str = "Uplink" if entry.get('direction') == 1 else \
-                        "Downlink" if entry.get('direction') == 2 else \
-                        f"Unknown ({entry.get('direction')})"
-        
-        send_status_str = "Not Sent" if entry.get('sendStatus') == 0 else \
-                          "Sent" if entry.get('sendStatus') == 1 else \
-                          "Send Failed" if entry.get('sendStatus') == -1 else \
-                          f"Unknown ({entry.get('sendStatus')})"
-
-        output.append(f"\nRecord #{i}:")
-        output.append(f"  ID: {entry.get('id', 'N/A')}")
-        output.append(f"  Direction: {direction_str}")
-        output.append(f"  Message Type: {entry.get('msgType', 'N/A')}")
-        output.append(f"  Data Type: {entry.get('dataType', 'N/A')}")
+        direction = entry.get('direction')
+        send_status = entry.get('sendStatus')
         
         # Format timestamps with both UTC and UTC+8
-        create_time = util.format_timestamp_with_timezone(entry.get('createTime'))
-        send_time = util.format_timestamp_with_timezone(entry.get('sendTime'))
-        update_time = util.format_timestamp_with_timezone(entry.get('updateTime'))
+        # Skip the formatter entirely for missing timestamps
+        create_time = entry.get('createTime')
+        send_time = entry.get('sendTime')
+        update_time = entry.get('updateTime')
         
-        output.append(f"  Created Time: {create_time}")
-        output.append(f"  Send Time: {send_time}")
-        output.append(f"  Update Time: {update_time}")
-        output.append(f"  Send Status: {send_status_str}")
-        output.append(f"  Raw Data (Base64): {entry.get('data', 'N/A')}")
-        output.append(f"  Thing Model Data (JSON): {entry.get('dmData', 'N/A')}")
-        output.append(f"  Ticket: {entry.get('ticket', 'N/A')}")
-        output.append(f"  Source Type: {entry.get('sourceType', 'N/A')}")
-        output.append(f"  Extended Data: {str(entry.get('extData', {}))}")
-
-    return "\n".join(output)
+        labels = {
+            'index': i,
+            'direction_str': _label(_DIRECTION_MAP, direction) or f"Unknown ({direction})",
+            'send_status_str': _label(_SEND_STATUS_MAP, send_status) or f"Unknown ({send_status})",
+            'create_time': fmt_ts(create_time) if create_time else 'N/A',
+            'send_time': fmt_ts(send_time) if send_time else 'N/A',
+            'update_time': fmt_ts(update_time) if update_time else 'N/A',
+            'ext_data': str(entry.get('extData', {})),
+        }
+        buf.write(_DATA_RECORD_TMPL.format_map(ChainMap(labels, entry, _NA_FIELDS)))
+
+    return buf.getvalue()
 
 @mcp.tool()
+@_run_in_thread
+@_report_api_errors
 def get_device_event_history(
     product_key: str,
     device_key: str,
@@ -550,9 +979,6 @@ def get_device_event_history(
         page_size=page_size
     )
 
-    if isinstance(event_history_data, str) and event_history_data.startswith("Error"):
-        return event_history_data
-
     if not isinstance(event_history_data, dict) or "data" not in event_history_data:
         return f"Error: Unexpected response format from API: {str(event_history_data)}"
 
@@ -570,48 +996,34 @@ def get_device_event_history(
     total_items = event_history_data.get('total')
     if isinstance(total_items, dict): total_items = total_items.get('value', 'N/A')
 
-    event_type_map = {
-        "0": "Offline",
-        "1": "Online",
-        "2": "Reconnect",
-        "3": "Information",
-        "4": "Alert",
-        "5": "Fault",
-        "6": "Reset"
-    }
-
-    output = [
+    header = "\n".join([
         f"Device Historical Event Records (Device: {device_key}, Product: {product_key})",
         f"===================================================================",
         f"Pagination Info: Page {current_page_num} / Total {total_pages} pages ({items_per_page} items per page, Total {total_items} items)",
         f"-------------------------------------------------------------------"
-    ]
+    ])
 
     if not data_entries:
-        output.append("No historical event data found for the given criteria.")
-        return "\n".join(output)
+        return f"{header}\nNo historical event data found for the given criteria."
 
+    buf = io.StringIO()
+    buf.write(header)
+    fmt_ts = util.format_timestamp_with_timezone
     for i, entry in enumerate(data_entries, 1):
         evt_type_code = entry.get('eventType', 'N/A')
-        evt_type_str = event_type_map.get(str(evt_type_code), f"Unknown Type ({evt_type_code})")
-
-        output.append(f"\nEvent #{i}:")
-        output.append(f"  ID: {entry.get('id', 'N/A')}")
-        output.append(f"  Event Type: {evt_type_str}")
-        output.append(f"  Event Code: {entry.get('eventCode', 'N/A')}")
-        output.append(f"  Event Name: {entry.get('eventName', 'N/A')}")
         
         # Format occurrence time with both UTC and UTC+8
-        occurrence_time = util.format_timestamp_with_timezone(entry.get('createTime'))
-        output.append(f"  Occurrence Time: {occurrence_time}")
+        occurrence_time = entry.get('createTime')
         
-        output.append(f"  Output Parameters: {entry.get('outputData', 'N/A')}")
-        output.append(f"  AB ID: {entry.get('abId', 'N/A')}")
-        output.append(f"  Packet ID: {entry.get('packetId', 'N/A')}")
-        output.append(f"  Ticket: {entry.get('ticket', 'N/A')}")
-        output.append(f"  Extended Data: {str(entry.get('extData', {}))}")
+        labels = {
+            'index': i,
+            'evt_type_str': _EVENT_TYPE_MAP.get(str(evt_type_code)) or f"Unknown Type ({evt_type_code})",
+            'occurrence_time': fmt_ts(occurrence_time) if occurrence_time else 'N/A',
+            'ext_data': str(entry.get('extData', {})),
+        }
+        buf.write(_EVENT_RECORD_TMPL.format_map(ChainMap(labels, entry, _NA_FIELDS)))
 
-    return "\n".join(output)
+    return buf.getvalue()
 
 @mcp.tool()
 def greet(name: str) -> str:
@@ -619,6 +1031,7 @@ def greet(name: str) -> str:
     return f"It is an awesome world, isn't it? {name}"
 
 @mcp.tool()
+@_run_in_thread
 def health_check() -> str:
     """Check if the IoT MCP server is running properly"""
     try:
@@ -632,6 +1045,7 @@ def health_check() -> str:
         return f"IoT MCP Server health check failed: {str(e)}"
 
 @mcp.tool()
+@_run_in_thread
 def get_device_latest_properties(product_key: str, device_key: str, property_filter: str = None) -> str:
     """
     Get device latest property values quickly (optimized for user experience)
@@ -645,8 +1059,16 @@ def get_device_latest_properties(product_key: str, device_key: str, property_fil
         Formatted latest property values with timestamps
     """
     try:
-        # Get product TSL definition dynamically
-        tsl_definition = util.get_product_tsl_json(product_key)
+        # Get product TSL definition and latest property values in parallel
+        tsl_future = _POOL.submit(_cached_tsl, product_key)
+        summary_future = _POOL.submit(
+            util.get_property_summary_quick, product_key, device_key,
+            lambda: _cached_thing_model(None, product_key, 'CN'),
+        )
+        try:
+            tsl_definition = tsl_future.result()
+        except util.IoTApiError:
+            tsl_definition = None
         
         output = [
             f"Device Latest Properties (Quick Summary)",
@@ -664,30 +1086,23 @@ def get_device_latest_properties(product_key: str, device_key: str, property_fil
             
             for prop in properties:
                 if isinstance(prop, dict):
-                    prop_name = prop.get('name', 'Unknown')
-                    prop_code = prop.get('code', 'unknown')
-                    prop_id = prop.get('id', 'N/A')
-                    data_type = prop.get('dataType', 'UNKNOWN')
-                    
-                    # Get unit from specs
+                    # Get unit from specs (STRUCT type typically has list specs, without a unit)
                     specs = prop.get('specs', {})
-                    unit = ''
-                    if isinstance(specs, dict):
-                        unit = specs.get('unit', '')
-                    elif isinstance(specs, list):
-                        unit = ''  # STRUCT type typically has list specs
+                    unit = specs.get('unit', '') if isinstance(specs, dict) else ''
                     
-                    output.append(f"🔹 {prop_name} ({prop_code})")
-                    output.append(f"   ├─ Type: {data_type}")
-                    output.append(f"   ├─ Unit: {unit}")
-                    output.append(f"   └─ Property ID: {prop_id}")
-                    output.append("")
+                    output.append(_PROP_TMPL.format(
+                        name=prop.get('name', 'Unknown'),
+                        code=prop.get('code', 'unknown'),
+                        dtype=prop.get('dataType', 'UNKNOWN'),
+                        unit=unit,
+                        pid=prop.get('id', 'N/A'),
+                    ))
         else:
             output.append("⚠️ Unable to retrieve TSL definition for this product.")
             output.append("")
         
-        # Get latest property values using the optimized function
-        latest_properties_result = util.get_property_summary_quick(product_key, device_key)
+        # Latest property values from the optimized summary function
+        latest_properties_result = summary_future.result()
         
         if isinstance(latest_properties_result, dict) and latest_properties_result.get('success'):
             combined_properties = latest_properties_result.get('combined_properties', {})
@@ -724,30 +1139,65 @@ def get_device_latest_properties(product_key: str, device_key: str, property_fil
     except Exception as e:
         return f"Error retrieving device properties: {str(e)}"
 
+# Startup banner; the tool list is generated from the FastMCP registry so it
+# always matches what is actually registered
+_BANNER_HEADER = "\n".join([
+    "Starting Enhanced IoT MCP Server...",
+    "New Features:",
+    "  - Device detail API integration",
+    "  - TSL property data queries",
+    "  - Historical data analysis",
+    "  - Enhanced online time detection",
+    "",
+    "Available tools:",
+])
+
+async def _build_banner() -> str:
+    """Assemble the startup banner from the registered tools"""
+    lines = [_BANNER_HEADER]
+    for tool in await mcp.list_tools():
+        summary = (tool.description or "").strip().split("\n", 1)[0]
+        lines.append(f"- {tool.name}: {summary}")
+    return "\n".join(lines)
+
+# Most products whose TSL definitions are prefetched at startup
+_WARM_TSL_LIMIT = 100
+
+def _warm_caches():
+    """
+    Prefetch the product list and the first products' TSL definitions into the caches
+    
+    Runs on its own background thread and fetches one TSL at a time, so the warm-up
+    never queues work on _POOL ahead of the first tool calls.
+    """
+    try:
+        products = _cached_list_products(100)
+    except util.IoTApiError:
+        return  # Credentials or network unavailable; tools will report it on first use
+    
+    product_keys = dict.fromkeys(p.get('productKey') for p in products if isinstance(p, dict) and p.get('productKey'))
+    for key in itertools.islice(product_keys, _WARM_TSL_LIMIT):
+        try:
+            _cached_tsl(key)
+        except util.IoTApiError:
+            pass
+
 # Startup code
 if __name__ == "__main__":
-    print("Starting Enhanced IoT MCP Server...")
-    print("New Features:")
-    print("  - Device detail API integration")
-    print("  - TSL property data queries") 
-    print("  - Historical data analysis")
-    print("  - Enhanced online time detection")
-    print("")
-    print("Available tools:")
-    print("- list_products: List all products")
-    print("- get_product_definition: Get product TSL definition")
-    print("- get_product_thing_model: Get product thing model (JSON format)")
-    print("- list_devices: List ALL devices (automatic pagination)")
-    print("- list_devices_formatted: List devices with timezone correction")
-    print("- get_device_details: Comprehensive device details (Enhanced API)")
-    print("- get_device_tsl_properties: Query TSL properties (temperature, humidity)")
-    print("- get_device_latest_online_time: Most accurate online time")
-    print("- power_switch: Control device power")
-    print("- query_device_location: Get device location (timezone corrected)")
-    print("- get_device_location_raw: Get raw location data")
-    print("- query_device_resources: Query device resources")
-    print("- greet: Greet a person")
-    print("- health_check: Check server health")
-    print("- get_device_latest_properties: Get device latest property values")
-    
-    mcp.run()
\ No newline at end of file
+    # stdout carries the MCP stdio protocol, so the banner goes to stderr;
+    # ACC_MCP_QUIET=1 skips it entirely
+    if os.environ.get("ACC_MCP_QUIET") != "1":
+        sys.stderr.write(asyncio.run(_build_banner()) + "\n")
+        sys.stderr.flush()
+    
+    # Warm product caches in the background so the first tool calls are cache hits;
+    # ACC_MCP_WARM=0 keeps startup fully cold
+    if os.environ.get("ACC_MCP_WARM", "1") == "1":
+        threading.Thread(target=_warm_caches, name="iot-mcp-warm", daemon=True).start()
+    
+    if uvloop is not None:
+        # Same stdio transport as mcp.run(), on a uvloop event loop
+        import anyio
+        anyio.run(mcp.run_stdio_async, backend_options={"use_uvloop": True})
+    else:
+        mcp.run()
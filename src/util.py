@@ -1,13 +1,88 @@
+import atexit
 import os
+import queue
 import time
+import functools
+import threading
 import hashlib
+import json
+import logging
+import math
 import urllib.parse
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone, timedelta
 import requests
 import jwt
-from datetime import datetime, timezone, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, responses are decoded with the stdlib parser without it
+    orjson = None
+
+# Parser for JSON embedded in API payloads (e.g. thingModelData strings)
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+logger = logging.getLogger(__name__)
+
+class IoTApiError(Exception):
+    """Raised when an IoT platform API call fails or returns an error response"""
+
+# Platform configuration comes from the environment (.env is loaded by the server
+# before util is imported) and does not change while the process runs
+@functools.lru_cache(maxsize=1)
+def _base_url():
+    return os.environ.get('BASE_URL')
+
+@functools.lru_cache(maxsize=1)
+def _credentials():
+    return os.environ.get('ACCESS_KEY'), os.environ.get('ACCESS_SECRET')
+
+def reset_config():
+    """Re-read BASE_URL, ACCESS_KEY and ACCESS_SECRET from the environment on next use"""
+    _base_url.cache_clear()
+    _credentials.cache_clear()
 
 # Set target timezone (using UTC as base, then provide both UTC and UTC+8)
 TARGET_TIMEZONE = timezone.utc
+# UTC+8 timezone object, built once instead of on every conversion
+UTC8_TIMEZONE = timezone(timedelta(hours=8))
+# UTC+8 has no DST, so local time is always a fixed offset from UTC
+_UTC8_OFFSET_S = int(UTC8_TIMEZONE.utcoffset(None).total_seconds())
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+# What a malformed or out-of-range timestamp can raise while being converted
+_TIMESTAMP_ERRORS = (TypeError, ValueError, OverflowError, OSError)
+
+# Epoch seconds whose UTC and UTC+8 wall-clock times both fall within years 1-9999
+_MIN_EPOCH_SECOND = -62135596800
+_MAX_EPOCH_SECOND = 253402300799 - _UTC8_OFFSET_S
+
+def _epoch_second(timestamp):
+    """
+    Whole epoch second of a millisecond timestamp, rounded the way datetime.fromtimestamp
+    rounds (to the nearest microsecond, half to even, then down to the second)
+    
+    Raises:
+        ValueError: If the time is outside the range datetime can represent in both zones
+    """
+    frac, whole = math.modf(timestamp / 1000)
+    whole = int(whole)
+    microseconds = round(frac * 1e6)
+    if microseconds >= 1000000:
+        whole += 1
+    elif microseconds < 0:
+        whole -= 1
+    if not _MIN_EPOCH_SECOND <= whole <= _MAX_EPOCH_SECOND:
+        raise ValueError(f"timestamp {timestamp} is out of range")
+    return whole
+
+@functools.lru_cache(maxsize=4096)
+def _format_epoch_second(seconds):
+    """Format a whole epoch second as (UTC, UTC+8) wall-clock strings; listings often repeat timestamps"""
+    return (time.strftime(_TIMESTAMP_FORMAT, time.gmtime(seconds)),
+            time.strftime(_TIMESTAMP_FORMAT, time.gmtime(seconds + _UTC8_OFFSET_S)))
 
 def format_timestamp_with_timezone(timestamp, show_both_timezones=True):
     """
@@ -20,7 +95,8 @@ def format_timestamp_with_timezone(timestamp, show_both_timezones=True):
     Returns:
         Formatted time string with both UTC and UTC+8 if show_both_timezones=True
     """
-    if not timestamp or timestamp == 0:
+    # None, 0 and "" (the usual unset optional fields) short-circuit before any conversion
+    if not timestamp:
         return "N/A"
     
     try:
@@ -28,21 +104,16 @@ def format_timestamp_with_timezone(timestamp, show_both_timezones=True):
         if isinstance(timestamp, str):
             timestamp = float(timestamp)
         
-        # Convert to datetime object (UTC time)
-        dt_utc = datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc)
-        # Convert to UTC+8 timezone
-        dt_utc8 = dt_utc.astimezone(timezone(timedelta(hours=8)))
+        utc_str, utc8_str = _format_epoch_second(_epoch_second(timestamp))
         
         if show_both_timezones:
             # Format output with both timezones
-            utc_str = dt_utc.strftime('%Y-%m-%d %H:%M:%S UTC')
-            utc8_str = dt_utc8.strftime('%Y-%m-%d %H:%M:%S UTC+8')
-            return f"{utc_str} / {utc8_str}"
+            return f"{utc_str} UTC / {utc8_str} UTC+8"
         else:
             # Return only UTC+8 for backward compatibility
-            return dt_utc8.strftime('%Y-%m-%d %H:%M:%S')
-    except Exception as e:
-        print(f"Timestamp conversion error for {timestamp}: {e}")
+            return utc8_str
+    except _TIMESTAMP_ERRORS as e:
+        logger.warning("Timestamp conversion error for %s: %s", timestamp, e)
         # Return a fallback formatted error instead of raw timestamp
         return f"Error: Invalid timestamp ({timestamp})"
 
@@ -60,48 +131,118 @@ def format_timestamp_detailed(timestamp):
         return {"utc": "N/A", "utc8": "N/A", "raw": timestamp}
     
     try:
-        # Convert to datetime object (UTC time)
-        dt_utc = datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc)
-        # Convert to UTC+8 timezone
-        dt_utc8 = dt_utc.astimezone(timezone(timedelta(hours=8)))
+        utc_str, utc8_str = _format_epoch_second(_epoch_second(timestamp))
         
         return {
-            "utc": dt_utc.strftime('%Y-%m-%d %H:%M:%S UTC'),
-            "utc8": dt_utc8.strftime('%Y-%m-%d %H:%M:%S UTC+8'),
+            "utc": f"{utc_str} UTC",
+            "utc8": f"{utc8_str} UTC+8",
             "raw": timestamp
         }
-    except Exception as e:
-        print(f"Timestamp conversion error: {e}")
+    except _TIMESTAMP_ERRORS as e:
+        logger.warning("Timestamp conversion error: %s", e)
         return {"utc": f"Error: {e}", "utc8": f"Error: {e}", "raw": timestamp}
 
+# Shared HTTP session: every API call reuses pooled keep-alive connections instead of
+# paying a fresh TCP/TLS handshake. Connection failures and throttling/gateway
+# statuses are retried with backoff; urllib3 never retries POST on those, so
+# power_switch commands are not re-sent. pool_block makes bursts beyond
+# pool_maxsize wait for a pooled connection rather than opening throwaway ones.
+_HTTP_TIMEOUT = (3, 10)  # (connect, read) seconds
+_SESSION = requests.Session()
+_SESSION.headers.update({"Content-Type": "application/json"})
+_HTTP_ADAPTER = HTTPAdapter(pool_connections=32, pool_maxsize=64, pool_block=True,
+                            max_retries=Retry(total=3, backoff_factor=0.3,
+                                              status_forcelist=[429, 500, 502, 503, 504]))
+_SESSION.mount("https://", _HTTP_ADAPTER)
+_SESSION.mount("http://", _HTTP_ADAPTER)
+atexit.register(_SESSION.close)
+
+def _response_json(response):
+    """Decode a JSON response body, using orjson when it is available"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+# Validators and decoded bodies of read-mostly endpoints, for conditional GETs
+_HTTP_CACHE_MAXSIZE = 256
+_http_cache = {}
+_http_cache_lock = threading.Lock()
+
+def _get_json_revalidated(url, headers, params=None):
+    """
+    GET a read-mostly endpoint and decode its JSON body, revalidating earlier responses
+    
+    When an earlier successful response carried an ETag or Last-Modified header, the
+    request is sent with If-None-Match / If-Modified-Since and a 304 reply reuses the
+    cached body, skipping the payload download and JSON decoding.
+    """
+    key = (url, tuple(sorted((params or {}).items())))
+    with _http_cache_lock:
+        cached = _http_cache.get(key)
+    
+    if cached:
+        headers = dict(headers)
+        etag, last_modified, _ = cached
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+    
+    response = _SESSION.get(url, headers=headers, params=params, timeout=_HTTP_TIMEOUT)
+    if cached and response.status_code == 304:
+        return cached[2]
+    response.raise_for_status()
+    content = _response_json(response)
+    
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if (etag or last_modified) and isinstance(content, dict) and content.get('code', 200) == 200:
+        with _http_cache_lock:
+            if key not in _http_cache and len(_http_cache) >= _HTTP_CACHE_MAXSIZE:
+                _http_cache.pop(next(iter(_http_cache)))
+            _http_cache[key] = (etag, last_modified, content)
+    return content
+
+# Current access token and its decoded expiry, so the JWT is decoded once per token
+# rather than on every API call
+_token_cache = {"token": None, "exp": 0.0}
+_token_lock = threading.Lock()
+
+def _token_expiry(token):
+    """Decode a token's exp claim without verification; 0 when it has none or is not a JWT"""
+    try:
+        decoded = jwt.decode(token, options={"verify_signature": False})
+    except jwt.DecodeError:
+        return 0.0
+    return float(decoded.get('exp') or 0)
+
 def get_access_token():
     """Check if current token exists and is valid (not expired or expiring within 1 hour)"""
-    access_token = os.environ.get('ACCESS_TOKEN')
-    
-    if access_token:
-        try:
-            # Decode token without verification to check expiration
-            decoded = jwt.decode(access_token, options={"verify_signature": False})
-            exp_time = decoded.get('exp')
-            
-            if exp_time and (exp_time - time.time() > 3600):  # More than 1 hour remaining
+    with _token_lock:
+        if _token_cache["token"] and _token_cache["exp"] - time.time() > 3600:
+            return _token_cache["token"]
+        
+        # A token configured in the environment is used while it is still fresh
+        access_token = os.environ.get('ACCESS_TOKEN')
+        if access_token and access_token != _token_cache["token"]:
+            exp = _token_expiry(access_token)
+            if exp - time.time() > 3600:  # More than 1 hour remaining
+                _token_cache.update(token=access_token, exp=exp)
                 return access_token
-        except jwt.DecodeError:
-            pass  # Token is invalid, will get new one
-    
-    # If we get here, either no token or it's expired/expiring soon
-    access_token = _get_access_token()
-    if access_token:
-        os.environ['ACCESS_TOKEN'] = access_token
-        return access_token
+        
+        # If we get here, either no token or it's expired/expiring soon
+        access_token = _get_access_token()
+        if access_token:
+            os.environ['ACCESS_TOKEN'] = access_token
+            _token_cache.update(token=access_token, exp=_token_expiry(access_token))
+            return access_token
     
-    print("Error: Failed to get access token")
+    logger.error("Failed to get access token")
     return None
 
 def _get_access_token():
     """Internal method to get new access token from API"""
-    access_key = os.environ.get('ACCESS_KEY')
-    access_secret = os.environ.get('ACCESS_SECRET')
+    access_key, access_secret = _credentials()
     
     if not access_key or not access_secret:
         return "Error: Missing ACCESS_KEY or ACCESS_SECRET"
@@ -115,121 +256,267 @@ def _get_access_token():
         'access_key': access_key,
         'timestamp': timestamp
     }
-    username_plain = '&'.join(f"{k}={v}" for k, v in username_params.items())
-    username = urllib.parse.quote(username_plain, safe="!'()*-._~")
+    # Encode once; the quoted username and the password hash both work on the bytes
+    username_bytes = '&'.join(f"{k}={v}" for k, v in username_params.items()).encode('utf-8')
+    username = urllib.parse.quote_from_bytes(username_bytes, safe=b"!'()*-._~")
     
     # Generate password hash
-    password_plain = f"{username_plain}{access_secret}"
-    password = hashlib.sha256(password_plain.encode('utf-8')).hexdigest()
+    password = hashlib.sha256(username_bytes + access_secret.encode('utf-8')).hexdigest()
 
-    base_url = os.environ.get('BASE_URL')
+    base_url = _base_url()
     url = f"{base_url}/v2/quecauth/accessKeyAuthrize/accessKeyLogin?grant_type=password&username={username}&password={password}"
 
     # Make API request to get token
     try:
-        response = requests.get(url, headers={"Content-Type": "application/json"})
+        response = _SESSION.get(url, timeout=_HTTP_TIMEOUT)
         response.raise_for_status()
-        token_data = response.json()
+        token_data = _response_json(response)
         access_token = token_data.get('access_token')
-        print(f"Token obtained successfully")
+        logger.info("Token obtained successfully")
         return access_token
     except Exception as e:
-        print(f"API Error: {str(e)}")
+        logger.error("API Error: %s", e)
         return "Error: Making the accessKeyLogin request error"
 
-def list_products(page_size=100):
+_PREFETCH_DONE = object()
+
+def _prefetch(iterable, depth=1):
     """
-    List all products with pagination support
+    Run an iterator on a background thread, keeping up to depth items ready ahead of the consumer
+    
+    Exceptions raised by the iterator are re-raised to the consumer. When the consumer
+    stops early, the background thread closes the iterator and exits.
+    """
+    iterator = iter(iterable)
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    
+    def put(entry):
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def produce():
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    close = getattr(iterator, 'close', None)
+                    if close is not None:
+                        close()
+                    return
+            put((_PREFETCH_DONE, None))
+        except BaseException as e:
+            put((_PREFETCH_DONE, e))
+    
+    threading.Thread(target=produce, name="iot-prefetch", daemon=True).start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _PREFETCH_DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+# Upper bound on pages fetched at once when the page count is known up front
+_PAGE_WORKERS = 8
+
+def _fetch_pages_concurrently(fetch_page, page_count, window=_PAGE_WORKERS):
+    """
+    Fetch pages 2..page_count in parallel, yielding (page_no, response) in page order
+    
+    At most window pages are requested ahead of the page being consumed; the next
+    one is submitted as each page is handed to the caller, and handed-over pages
+    are not kept. Stops at the first page whose request fails, like the sequential
+    walks. Queued pages are cancelled once the caller stops iterating.
+    """
+    if page_count < 2:
+        return
+    
+    window = max(1, min(window, page_count - 1))
+    next_page = 2
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=window) as executor:
+        def submit_next():
+            nonlocal next_page
+            if next_page <= page_count:
+                pending.append((next_page, executor.submit(fetch_page, next_page)))
+                next_page += 1
+        
+        try:
+            for _ in range(window):
+                submit_next()
+            while pending:
+                page_no, future = pending.popleft()
+                try:
+                    content = future.result()
+                except Exception as e:
+                    logger.error("API Error on page %s: %s", page_no, e)
+                    return
+                submit_next()
+                yield page_no, content
+        finally:
+            # Don't wait on pages nobody will read
+            for _, future in pending:
+                future.cancel()
+
+def _page_count(content, page_size):
+    """Number of pages a paginated response reports (capped at 100), or None when it doesn't say"""
+    for key in ('pages', 'totalPages'):
+        if isinstance(content.get(key), int):
+            return min(content[key], 100)
+    total = content.get('total')
+    if isinstance(total, int):
+        return min(-(-total // page_size), 100)
+    return None
+
+# Pagination fields the platform may report, logged for diagnostics
+_PAGINATION_KEYS = ('total', 'pageInfo', 'pageSize', 'pageNo', 'totalPages', 'hasMore', 'pages')
+
+def _fetch_product_page(base_url, page_size, page_no):
+    """Fetch one page of the product list and return the decoded response"""
+    url = f"{base_url}/v2/quecproductmgr/r3/openapi/products"
+    params = {'pageSize': page_size, 'pageNo': page_no}
+    logger.debug("Querying page %s with URL: %s params: %s", page_no, url, params)
+    return _get_json_revalidated(url, headers={
+        "Authorization": get_access_token()
+    }, params=params)
+
+def iter_product_pages(page_size=100, ahead=_PAGE_WORKERS):
+    """
+    Iterate over all products one page at a time
     
     Args:
         page_size: Number of products per page (default: 100)
+        ahead: Most pages requested ahead of the one being consumed once the page
+            count is known (default: _PAGE_WORKERS)
         
-    Returns:
-        List of all products (automatically handles pagination)
+    Yields:
+        list: Products of each page in order
+        
+    Raises:
+        IoTApiError: If the first page cannot be fetched
     """
-    base_url = os.environ.get('BASE_URL')
-    all_products = []
+    base_url = _base_url()
+    product_count = 0
     page_no = 1
     
-    print(f"DEBUG: Starting product list query with page_size={page_size}")
+    # Per-page diagnostics are only assembled when debug logging is on
+    debug = logger.isEnabledFor(logging.DEBUG)
+    logger.debug("Starting product list query with page_size=%s", page_size)
     
     while True:
-        # Add pagination parameters
-        url = f"{base_url}/v2/quecproductmgr/r3/openapi/products?pageSize={page_size}&pageNo={page_no}"
-        
         try:
-            print(f"DEBUG: Querying page {page_no} with URL: {url}")
-            response = requests.get(url, headers={
-                "Content-Type": "application/json",
-                "Authorization": get_access_token()
-            })
-            response.raise_for_status()
-            content = response.json()
+            content = _fetch_product_page(base_url, page_size, page_no)
             
-            print(f"DEBUG: Page {page_no} response code: {content.get('code')}")
-            print(f"DEBUG: Page {page_no} response keys: {list(content.keys())}")
+            if debug:
+                logger.debug("Page %s response code: %s, keys: %s", page_no, content.get('code'), list(content))
             
             if content.get('code') != 200:
                 error_msg = content.get('msg', 'Unknown error')
                 if page_no == 1:
-                    return f"Error: {error_msg}"
-                print(f"Warning: Page {page_no} returned error: {error_msg}")
+                    raise IoTApiError(error_msg)
+                logger.warning("Page %s returned error: %s", page_no, error_msg)
                 break
             
             if "data" not in content:
-                print(f"Warning: No data field in API response for page {page_no}")
+                logger.warning("No data field in API response for page %s", page_no)
                 break
                 
             page_products = content["data"]
-            print(f"DEBUG: Page {page_no} returned {len(page_products)} products")
             
-            # Check for pagination info in response
-            for key in ['total', 'pageInfo', 'pageSize', 'pageNo', 'totalPages', 'hasMore', 'pages']:
-                if key in content:
-                    print(f"DEBUG: {key}: {content.get(key)}")
+            if debug:
+                # Pagination info reported by the response
+                pagination = {key: content[key] for key in _PAGINATION_KEYS if key in content}
+                logger.debug("Page %s returned %s products, pagination: %s", page_no, len(page_products), pagination)
             
             if not page_products or len(page_products) == 0:
-                print(f"DEBUG: Page {page_no} has no products, stopping pagination")
+                logger.debug("Page %s has no products, stopping pagination", page_no)
                 break
                 
-            all_products.extend(page_products)
+            product_count += len(page_products)
+            yield page_products
             
             # If this page has fewer products than page_size, we've reached the end
             if len(page_products) < page_size:
-                print(f"DEBUG: Page {page_no} has {len(page_products)} < {page_size} products, reached end")
+                logger.debug("Page %s has %s < %s products, reached end", page_no, len(page_products), page_size)
+                break
+            
+            page_count = _page_count(content, page_size)
+            if page_no == 1 and page_count is not None:
+                # Page count is known, so fetch the rest in parallel
+                fetch_page = functools.partial(_fetch_product_page, base_url, page_size)
+                for page_no, content in _fetch_pages_concurrently(fetch_page, page_count, ahead):
+                    if content.get('code') != 200:
+                        logger.warning("Page %s returned error: %s", page_no, content.get('msg', 'Unknown error'))
+                        break
+                    page_products = content.get("data")
+                    if not page_products:
+                        break
+                    product_count += len(page_products)
+                    yield page_products
                 break
                 
             page_no += 1
             
             # Safety measure to prevent infinite loops
             if page_no > 100:  
-                print(f"Warning: Already queried 100 pages, stopping pagination query")
+                logger.warning("Already queried 100 pages, stopping pagination query")
                 break
                 
+        except IoTApiError:
+            raise
         except Exception as e:
-            print(f"API Error on page {page_no}: {str(e)}")
+            logger.error("API Error on page %s: %s", page_no, e)
             if page_no == 1:
-                return "Error: List products error"
+                raise IoTApiError("List products error") from e
             break
     
-    print(f"Successfully retrieved {len(all_products)} products (total {page_no-1} pages)")
+    logger.info("Successfully retrieved %s products (total %s pages)", product_count, page_no - 1)
+
+def iter_products(page_size=100):
+    """
+    Iterate over all products, fetching the next page in the background
+    
+    Raises:
+        IoTApiError: If the first page cannot be fetched
+    """
+    for page_products in _prefetch(iter_product_pages(page_size, ahead=1)):
+        yield from page_products
+
+def list_products(page_size=100):
+    """
+    List all products with pagination support
+    
+    Args:
+        page_size: Number of products per page (default: 100)
+        
+    Returns:
+        List of all products (automatically handles pagination)
+    """
+    all_products = []
+    for page_products in iter_product_pages(page_size):
+        all_products.extend(page_products)
     return all_products
 
 def get_product_tsl_json(product_key):
     """Get product TSL definition by productKey"""
-    base_url = os.environ.get('BASE_URL')
-    url = f"{base_url}/v2/quectsl/openapi/product/export/tslFile?productKey={product_key}"
+    base_url = _base_url()
+    url = f"{base_url}/v2/quectsl/openapi/product/export/tslFile"
     try:
-        response = requests.get(url, headers={
-            "Content-Type": "application/json",
+        content = _get_json_revalidated(url, headers={
             "Authorization": get_access_token()
-        })
-        response.raise_for_status()
-        content = response.json()
+        }, params={'productKey': product_key})
         return content["data"]
     except Exception as e:
-        print(f"API Error: {str(e)}")
-        return "Error: Making the tslFile request error"
+        logger.error("API Error: %s", e)
+        raise IoTApiError("Making the tslFile request error") from e
 
 def get_product_thing_model(product_id: int = None, product_key: str = None, language: str = 'CN'):
     """
@@ -243,7 +530,7 @@ def get_product_thing_model(product_id: int = None, product_key: str = None, lan
     Returns:
         dict: Product thing model data in JSON format
     """
-    base_url = os.environ.get('BASE_URL')
+    base_url = _base_url()
     url = f"{base_url}/v2/quectsl/openapi/product/export/tslFile"
     
     params = {'language': language}
@@ -252,82 +539,133 @@ def get_product_thing_model(product_id: int = None, product_key: str = None, lan
     elif product_key:
         params['productKey'] = product_key
     else:
-        return "Error: Either productId or productKey must be provided."
+        raise IoTApiError("Either productId or productKey must be provided.")
         
     try:
-        response = requests.get(url, headers={
-            "Content-Type": "application/json",
+        content = _get_json_revalidated(url, headers={
             "Authorization": get_access_token()
         }, params=params)
-        response.raise_for_status()
-        content = response.json()
         
         if content.get('code') != 200:
             error_msg = content.get('msg', 'Unknown error')
-            return f"Error: {error_msg}"
+            raise IoTApiError(error_msg)
             
         return content.get("data", {})
         
+    except IoTApiError:
+        raise
     except Exception as e:
-        print(f"API Error: {str(e)}")
-        return f"Error: Failed to get product thing model: {str(e)}"
+        logger.error("API Error: %s", e)
+        raise IoTApiError(f"Failed to get product thing model: {str(e)}") from e
 
-def list_devices(product_key, page_size=100):
+# Workers for fetching the independent sources a single device query combines
+_DETAIL_POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix="acc-detail")
+
+def _fetch_device_page(base_url, product_key, page_size, page_no):
+    """Fetch one page of the device overview and return the decoded response"""
+    url = f"{base_url}/v2/devicemgr/r3/openapi/product/device/overview"
+    params = {'productKey': product_key, 'pageSize': page_size, 'pageNo': page_no}
+    response = _SESSION.get(url, headers={
+        "Authorization": get_access_token()
+    }, params=params, timeout=_HTTP_TIMEOUT)
+    response.raise_for_status()
+    return _response_json(response)
+
+def iter_device_pages(product_key, page_size=100, ahead=_PAGE_WORKERS):
     """
-    List devices in product with pagination support
+    Iterate over devices in product one page at a time
+    
+    The first page is fetched on its own. When its response reports the total device
+    count, the remaining pages are fetched concurrently; otherwise pages are walked
+    one by one until a short page comes back.
     
     Args:
         product_key: Product key
         page_size: Number of devices per page (default: 100)
+        ahead: Most pages requested ahead of the one being consumed once the page
+            count is known (default: _PAGE_WORKERS)
         
-    Returns:
-        List of all devices (automatically handles pagination)
+    Yields:
+        list: Devices of each page in order
+        
+    Raises:
+        IoTApiError: If the first page cannot be fetched
     """
-    base_url = os.environ.get('BASE_URL')
-    all_devices = []
+    base_url = _base_url()
+    device_count = 0
     page_no = 1
     
     while True:
-        # Add pagination parameters
-        url = f"{base_url}/v2/devicemgr/r3/openapi/product/device/overview?productKey={product_key}&pageSize={page_size}&pageNo={page_no}"
-        
         try:
-            response = requests.get(url, headers={
-                "Content-Type": "application/json",
-                "Authorization": get_access_token()
-            })
-            response.raise_for_status()
-            content = response.json()
+            content = _fetch_device_page(base_url, product_key, page_size, page_no)
             
             if "data" not in content:
-                print(f"Warning: No data field in API response")
+                logger.warning("No data field in API response")
                 break
                 
             page_devices = content["data"]
             
             if not page_devices or len(page_devices) == 0:
                 break
-                
-            all_devices.extend(page_devices)
+            
+            device_count += len(page_devices)
+            yield page_devices
             
             if len(page_devices) < page_size:
                 break
+            
+            page_count = _page_count(content, page_size)
+            if page_no == 1 and page_count is not None:
+                # Page count is known, so fetch the rest in parallel
+                fetch_page = functools.partial(_fetch_device_page, base_url, product_key, page_size)
+                for page_no, content in _fetch_pages_concurrently(fetch_page, page_count, ahead):
+                    page_devices = content.get("data")
+                    if not page_devices:
+                        break
+                    device_count += len(page_devices)
+                    yield page_devices
+                break
                 
             page_no += 1
             
             if page_no > 100:  # Safety measure
-                print(f"Warning: Already queried 100 pages, stopping pagination query")
+                logger.warning("Already queried 100 pages, stopping pagination query")
                 break
                 
         except Exception as e:
-            print(f"API Error on page {page_no}: {str(e)}")
+            logger.error("API Error on page %s: %s", page_no, e)
             if page_no == 1:
-                return "Error: List devices error"
+                raise IoTApiError("List devices error") from e
             break
     
-    print(f"Successfully retrieved {len(all_devices)} devices (total {page_no-1} pages)")
+    logger.info("Successfully retrieved %s devices (total %s pages)", device_count, page_no - 1)
+
+def list_devices(product_key, page_size=100):
+    """
+    List devices in product with pagination support
+    
+    Args:
+        product_key: Product key
+        page_size: Number of devices per page (default: 100)
+        
+    Returns:
+        List of all devices (automatically handles pagination)
+    """
+    all_devices = []
+    for page_devices in iter_device_pages(product_key, page_size):
+        all_devices.extend(page_devices)
     return all_devices
 
+def iter_devices(product_key, page_size=100):
+    """
+    Iterate over devices in product, fetching the next page in the background
+    
+    Raises:
+        IoTApiError: If the first page cannot be fetched
+    """
+    for page_devices in _prefetch(iter_device_pages(product_key, page_size, ahead=1)):
+        yield from page_devices
+
 def get_device_detail(product_key, device_key):
     """
     Get device detailed information - using new detail API
@@ -339,24 +677,24 @@ def get_device_detail(product_key, device_key):
     Returns:
         dict: Detailed device information, including first connection time, last online time, etc.
     """
-    base_url = os.environ.get('BASE_URL')
-    url = f"{base_url}/v2/devicemgr/r3/openapi/device/detail?productKey={product_key}&deviceKey={device_key}"
+    base_url = _base_url()
+    url = f"{base_url}/v2/devicemgr/r3/openapi/device/detail"
+    params = {'productKey': product_key, 'deviceKey': device_key}
     
     try:
-        response = requests.get(url, headers={
-            "Content-Type": "application/json",
+        response = _SESSION.get(url, headers={
             "Authorization": get_access_token()
-        })
+        }, params=params, timeout=_HTTP_TIMEOUT)
         response.raise_for_status()
-        content = response.json()
+        content = _response_json(response)
         
         if content.get('code') != 200:
             error_msg = content.get('msg', 'Unknown error')
-            return f"Error: {error_msg}"
+            raise IoTApiError(error_msg)
         
         device_data = content.get("data", {})
         if not device_data:
-            return "No device detail found"
+            raise IoTApiError("No device detail found")
         
         # Add formatted time with both UTC and UTC+8
         device_data['formattedCreateTime'] = format_timestamp_with_timezone(device_data.get('createTime'))
@@ -368,9 +706,45 @@ def get_device_detail(product_key, device_key):
         
         return device_data
         
+    except IoTApiError:
+        raise
     except Exception as e:
-        print(f"API Error: {str(e)}")
-        return f"Error: Failed to get device detail: {str(e)}"
+        logger.error("API Error: %s", e)
+        raise IoTApiError(f"Failed to get device detail: {str(e)}") from e
+
+# Workers for one batch of detail requests. Each batch gets its own executor so a
+# large product cannot queue thousands of requests ahead of _DETAIL_POOL's users.
+_DETAIL_SCAN_WORKERS = 16
+
+def fetch_device_details(product_key, device_keys):
+    """
+    Get the detail records of the given devices, fetched concurrently
+    
+    The requests run on a batch-local pool of _DETAIL_SCAN_WORKERS threads.
+    
+    Args:
+        product_key: Product key
+        device_keys: Device keys to fetch
+        
+    Returns:
+        list: Device details in the order of device_keys; a device whose detail request
+        failed is represented as {'deviceKey': ..., 'error': ...}
+    """
+    def detail_or_error(device_key):
+        try:
+            return get_device_detail(product_key, device_key)
+        except IoTApiError as e:
+            return {'deviceKey': device_key, 'error': str(e)}
+    
+    if not device_keys:
+        return []
+    with ThreadPoolExecutor(max_workers=min(_DETAIL_SCAN_WORKERS, len(device_keys)),
+                            thread_name_prefix="acc-detail-scan") as executor:
+        return list(executor.map(detail_or_error, device_keys))
+
+# Property endpoint that last returned data for each product, tried on its own before
+# probing the others
+_property_endpoints = {}
 
 def query_device_properties(product_key, device_key):
     """
@@ -383,7 +757,7 @@ def query_device_properties(product_key, device_key):
     Returns:
         dict: Device property data
     """
-    base_url = os.environ.get('BASE_URL')
+    base_url = _base_url()
     
     # Try different property query API endpoints
     possible_endpoints = [
@@ -393,26 +767,85 @@ def query_device_properties(product_key, device_key):
         f"/v2/deviceshadow/r1/openapi/device/property"
     ]
     
-    for endpoint in possible_endpoints:
-        url = f"{base_url}{endpoint}?productKey={product_key}&deviceKey={device_key}"
+    def probe(endpoint):
+        """Return (served, data): served is True only when the endpoint answered with code 200"""
+        response = _SESSION.get(f"{base_url}{endpoint}", headers={
+            "Authorization": get_access_token()
+        }, params={'productKey': product_key, 'deviceKey': device_key}, timeout=_HTTP_TIMEOUT)
         
+        if response.status_code != 200:
+            return False, None
+        content = _response_json(response)
+        if content.get('code') != 200:
+            return False, None
+        return True, content.get('data') or None
+    
+    def probe_in_order(endpoints):
+        """Return (endpoint, data) for the first endpoint listed that has data, or (None, None)"""
+        # Probe every endpoint at once, but read the answers in the order listed so the
+        # highest-priority endpoint with data wins regardless of response timing. All
+        # requests are sent; cancelling below only drops probes still queued, and
+        # probes already in flight run to completion in the background.
+        futures = [_DETAIL_POOL.submit(probe, endpoint) for endpoint in endpoints]
         try:
-            response = requests.get(url, headers={
-                "Content-Type": "application/json",
-                "Authorization": get_access_token()
-            })
-            
-            if response.status_code == 200:
-                content = response.json()
-                if content.get('code') == 200 and content.get('data'):
-                    print(f"Successfully retrieved property data from endpoint: {endpoint}")
-                    return content.get('data')
-                    
+            for endpoint, future in zip(endpoints, futures):
+                try:
+                    _, data = future.result()
+                except Exception as e:
+                    logger.debug("Failed to try endpoint %s: %s", endpoint, e)
+                    continue
+                if data:
+                    return endpoint, data
+        finally:
+            for future in futures:
+                future.cancel()
+        return None, None
+    
+    # Fast path: the endpoint that answered last time for this product
+    remembered = _property_endpoints.get(product_key)
+    candidates = possible_endpoints
+    if remembered is not None:
+        try:
+            served, data = probe(remembered)
         except Exception as e:
-            print(f"Failed to try endpoint {endpoint}: {str(e)}")
-            continue
+            logger.debug("Failed to try endpoint %s: %s", remembered, e)
+            served, data = False, None
+        if data:
+            return data
+        if not served:
+            # It stopped answering for this product; forget it
+            _property_endpoints.pop(product_key, None)
+        # Fall back to the other endpoints, still in priority order
+        candidates = [endpoint for endpoint in possible_endpoints if endpoint != remembered]
+    
+    endpoint, data = probe_in_order(candidates)
+    if data:
+        logger.info("Successfully retrieved property data from endpoint: %s", endpoint)
+        # A remembered endpoint that still answers keeps its place; this device may
+        # simply have no data there
+        _property_endpoints.setdefault(product_key, endpoint)
+        return data
+    
+    raise IoTApiError("No TSL property data available from any endpoint")
+
+def _add_formatted_device_times(device):
+    """Add formatted time fields (UTC and UTC+8) to a device overview record"""
+    device['formattedCreateTime'] = format_timestamp_with_timezone(device.get('createTime'))
+    device['formattedActivedTime'] = format_timestamp_with_timezone(device.get('activedTime'))
+    device['formattedUpdateTime'] = format_timestamp_with_timezone(device.get('updateTime'))
+    return device
+
+def iter_device_pages_with_formatted_time(product_key, page_size=100):
+    """
+    Iterate over device pages with formatted timestamps, one page at a time
     
-    return "No TSL property data available from any endpoint"
+    Meant for callers that read every page: pages are fetched in the background with
+    the same concurrency as list_devices while the caller handles the current one.
+    """
+    for page_devices in _prefetch(iter_device_pages(product_key, page_size)):
+        for device in page_devices:
+            _add_formatted_device_times(device)
+        yield page_devices
 
 def list_devices_with_formatted_time(product_key, page_size=100):
     """
@@ -420,49 +853,47 @@ def list_devices_with_formatted_time(product_key, page_size=100):
     """
     devices = list_devices(product_key, page_size)
     
-    if isinstance(devices, str):  # Error case
-        return devices
-    
     # Add formatted time for each device
     for device in devices:
-        device['formattedCreateTime'] = format_timestamp_with_timezone(device.get('createTime'))
-        device['formattedActivedTime'] = format_timestamp_with_timezone(device.get('activedTime'))
-        device['formattedUpdateTime'] = format_timestamp_with_timezone(device.get('updateTime'))
+        _add_formatted_device_times(device)
     
     return devices
 
+# writeData payloads for the switch property; the platform expects the values as strings
+_SWITCH_DATA_ON = '[{"switch":"true"}]'
+_SWITCH_DATA_OFF = '[{"switch":"false"}]'
+
 def power_switch(product_key, device_key, on_off):
     """Turn the device power switch on or off"""
-    base_url = os.environ.get('BASE_URL')
+    base_url = _base_url()
     url = f"{base_url}/v2/deviceshadow/r3/openapi/dm/writeData"
 
-    # Convert 'on'/'off' to 'true'/'false'
-    switch_state = 'true' if on_off.lower() == 'on' else 'false'
-    
     request_body = {
-        "data": f'[{{"switch":"{switch_state}"}}]',
+        "data": _SWITCH_DATA_ON if on_off.lower() == 'on' else _SWITCH_DATA_OFF,
         "devices": [device_key],
         "productKey": product_key
     }
     
     try:
-        response = requests.post(
+        response = _SESSION.post(
             url,
             headers={
-                "Content-Type": "application/json",
                 "Authorization": get_access_token()
             },
-            json=request_body
+            json=request_body,
+            timeout=_HTTP_TIMEOUT
         )
         response.raise_for_status()
-        content = response.json()
+        content = _response_json(response)
         if content['code'] == 200 and content['data'][0]['code'] == 200:
             return "Success"
         else:
-            return f"Error: {content['msg']}"
+            raise IoTApiError(content['msg'])
+    except IoTApiError:
+        raise
     except Exception as e:
-        print(f"API Error: {str(e)}")
-        return "Error: Failed to control device"
+        logger.error("API Error: %s", e)
+        raise IoTApiError("Failed to control device") from e
 
 def query_device_location(product_key=None, device_key=None, device_id=None, language='CN'):
     """
@@ -470,41 +901,43 @@ def query_device_location(product_key=None, device_key=None, device_id=None, lan
     """
     # Validate input parameters
     if not device_id and not (product_key and device_key):
-        return "Error: Either device_id or both product_key and device_key must be provided"
+        raise IoTApiError("Either device_id or both product_key and device_key must be provided")
     
-    base_url = os.environ.get('BASE_URL')
+    base_url = _base_url()
     
-    # Build complete URL, directly concatenate parameters
+    # Endpoint URL; query parameters are encoded by requests
+    url = f"{base_url}/v2/deviceshadow/r1/openapi/device/getlocation"
     if device_id:
-        url = f"{base_url}/v2/deviceshadow/r1/openapi/device/getlocation?deviceId={device_id}&language={language}"
+        params = {'deviceId': device_id, 'language': language}
     else:
-        url = f"{base_url}/v2/deviceshadow/r1/openapi/device/getlocation?productKey={product_key}&deviceKey={device_key}&language={language}"
+        params = {'productKey': product_key, 'deviceKey': device_key, 'language': language}
     
     try:
-        response = requests.get(url, headers={
-            "Content-Type": "application/json", 
+        response = _SESSION.get(url, headers={
             "Authorization": get_access_token()
-        })
+        }, params=params, timeout=_HTTP_TIMEOUT)
         response.raise_for_status()
-        content = response.json()
+        content = _response_json(response)
         
         # Check response code
         if content.get('code') != 200:
             error_msg = content.get('msg', 'Unknown error')
-            return f"Error: {error_msg}"
+            raise IoTApiError(error_msg)
         
         location_data = content.get("data", {})
         if not location_data:
-            return "No location data found for the specified device"
+            raise IoTApiError("No location data found for the specified device")
         
         # Add formatted location time
         if 'locateTime' in location_data:
             location_data['formattedLocateTime'] = format_timestamp_with_timezone(location_data['locateTime'])
         
         return location_data
+    except IoTApiError:
+        raise
     except Exception as e:
-        print(f"API Error: {str(e)}")
-        return f"Error: API request failed: {str(e)}"
+        logger.error("API Error: %s", e)
+        raise IoTApiError(f"API request failed: {str(e)}") from e
 
 def get_device_latest_online_time(product_key, device_key):
     """
@@ -521,29 +954,37 @@ def get_device_latest_online_time(product_key, device_key):
         'detailSource': 'device_detail'
     }
     
+    # Detail and location are independent sources, so fetch them concurrently
+    detail_future = _DETAIL_POOL.submit(get_device_detail, product_key, device_key)
+    location_future = _DETAIL_POOL.submit(query_device_location, product_key=product_key, device_key=device_key)
+    
     # 1. Get device detailed information (including lastConnTime)
-    device_detail = get_device_detail(product_key, device_key)
-    if isinstance(device_detail, dict):
+    try:
+        device_detail = detail_future.result()
         result['lastConnTime'] = device_detail.get('lastConnTime')
         result['deviceUpdateTime'] = device_detail.get('updateTime')
+    except IoTApiError:
+        pass  # Fall back to the remaining sources
     
     # 2. Get locateTime from location information
-    location_data = query_device_location(product_key=product_key, device_key=device_key)
-    if isinstance(location_data, dict) and 'locateTime' in location_data:
-        result['locationTime'] = location_data['locateTime']
-    
-    # 3. Select the latest time
-    times_to_compare = []
-    if result['deviceUpdateTime']:
-        times_to_compare.append((result['deviceUpdateTime'], 'device_update'))
-    if result['locationTime']:
-        times_to_compare.append((result['locationTime'], 'location'))
-    if result['lastConnTime']:
-        times_to_compare.append((result['lastConnTime'], 'last_connection'))
-    
-    if times_to_compare:
-        # Select the latest time
-        latest_time, source = max(times_to_compare, key=lambda x: x[0])
+    try:
+        location_data = location_future.result()
+        if 'locateTime' in location_data:
+            result['locationTime'] = location_data['locateTime']
+    except IoTApiError:
+        pass
+    
+    # 3. Select the latest time (earlier sources win ties)
+    latest_time, source = None, None
+    for candidate, candidate_source in (
+        (result['deviceUpdateTime'], 'device_update'),
+        (result['locationTime'], 'location'),
+        (result['lastConnTime'], 'last_connection'),
+    ):
+        if candidate and (latest_time is None or candidate > latest_time):
+            latest_time, source = candidate, candidate_source
+    
+    if latest_time is not None:
         result['latestTime'] = latest_time
         result['source'] = source
         result['latestTimeFormatted'] = format_timestamp_with_timezone(latest_time)
@@ -610,7 +1051,7 @@ def query_device_resources(product_key: str, device_key: str, language: str = 'C
     Returns:
         dict: Device resource data
     """
-    base_url = os.environ.get('BASE_URL')
+    base_url = _base_url()
     url = f"{base_url}/v2/deviceshadow/r2/openapi/device/resource"
 
     params = {
@@ -619,42 +1060,45 @@ def query_device_resources(product_key: str, device_key: str, language: str = 'C
         'language': language
     }
 
+    response = None
     try:
-        response = requests.get(url, headers={
+        response = _SESSION.get(url, headers={
             "Content-Type": "application/x-www-form-urlencoded",
             "Authorization": get_access_token()
-        }, params=params)
+        }, params=params, timeout=_HTTP_TIMEOUT)
         response.raise_for_status() # Raises an HTTPError for bad responses (4XX or 5XX)
-        content = response.json()
-        print(f"DEBUG: query_device_resources API response from util.py: {content!r}")
+        content = _response_json(response)
+        logger.debug("query_device_resources API response from util.py: %r", content)
 
         if content.get('code') != 200:
             error_msg = content.get('msg', 'Unknown API error')
-            print(f"DEBUG: query_device_resources API error - Code: {content.get('code')}, Msg: {error_msg}")
-            return f"Error from API ({content.get('code')}): {error_msg}"
+            logger.debug("query_device_resources API error - Code: %s, Msg: %s", content.get('code'), error_msg)
+            raise IoTApiError(f"API returned code {content.get('code')}: {error_msg}")
 
         data_payload = content.get("data")
         if data_payload is None:
-            print(f"DEBUG: query_device_resources API response has 'data' as None or not present. Full content: {content!r}")
+            logger.debug("query_device_resources API response has 'data' as None or not present. Full content: %r", content)
             return {} # Return empty dict if data is None, signifying no specific resource data found
         return data_payload
 
+    except IoTApiError:
+        raise
     except requests.exceptions.HTTPError as e:
-        print(f"ERROR: HTTP Error in query_device_resources: {e}")
+        logger.error("HTTP Error in query_device_resources: %s", e)
         if e.response is not None:
-            print(f"ERROR: Response status: {e.response.status_code}, Response content: {e.response.text}")
-        return f"Error: HTTP error {e.response.status_code if e.response else 'unknown'} while querying device resources: {e.response.text if e.response else str(e)}"
+            logger.error("Response status: %s, Response content: %s", e.response.status_code, e.response.text)
+        raise IoTApiError(f"HTTP error {e.response.status_code if e.response else 'unknown'} while querying device resources: {e.response.text if e.response else str(e)}") from e
     except requests.exceptions.RequestException as e:
-        print(f"ERROR: Network/Request Error in query_device_resources: {e}")
-        return f"Error: Failed to query device resources due to network/request issue: {str(e)}"
+        logger.error("Network/Request Error in query_device_resources: %s", e)
+        raise IoTApiError(f"Failed to query device resources due to network/request issue: {str(e)}") from e
     except ValueError as e: # Catches JSONDecodeError
-        print(f"ERROR: JSON Parsing Error in query_device_resources: {str(e)}")
-        if 'response' in locals() and hasattr(response, 'text'):
-            print(f"ERROR: Response text that caused JSON parsing error: {response.text}")
-        return f"Error: Failed to parse JSON response from device resources API: {str(e)}"
+        logger.error("JSON Parsing Error in query_device_resources: %s", e)
+        if response is not None:
+            logger.error("Response text that caused JSON parsing error: %s", response.text)
+        raise IoTApiError(f"Failed to parse JSON response from device resources API: {str(e)}") from e
     except Exception as e:
-        print(f"ERROR: Unexpected General Error in query_device_resources: {str(e)}")
-        return f"Error: An unexpected error occurred while querying device resources: {str(e)}"
+        logger.error("Unexpected General Error in query_device_resources: %s", e)
+        raise IoTApiError(f"An unexpected error occurred while querying device resources: {str(e)}") from e
 
 def query_device_data_history(
     product_key: str, 
@@ -672,56 +1116,55 @@ def query_device_data_history(
     Query Device Historical Uplink/Downlink Data Logs
     API: /v2/quecdatastorage/r1/openapi/device/data/history
     """
-    base_url = os.environ.get('BASE_URL')
+    base_url = _base_url()
     url = f"{base_url}/v2/quecdatastorage/r1/openapi/device/data/history"
 
+    # requests leaves None-valued params out of the query string
     params = {
         'productKey': product_key,
         'deviceKey': device_key,
         'language': language,
         'pageNum': page_num,
-        'pageSize': page_size
+        'pageSize': page_size,
+        'deviceId': device_id,
+        'beginDateTimp': begin_date_timp,
+        'endDateTimp': end_date_timp,
+        'direction': direction,
+        'sendStatus': send_status,
     }
-    if device_id is not None:
-        params['deviceId'] = device_id
-    if begin_date_timp is not None:
-        params['beginDateTimp'] = begin_date_timp
-    if end_date_timp is not None:
-        params['endDateTimp'] = end_date_timp
-    if direction is not None:
-        params['direction'] = direction
-    if send_status is not None:
-        params['sendStatus'] = send_status
 
+    response = None
     try:
-        response = requests.get(url, headers={
+        response = _SESSION.get(url, headers={
             "Content-Type": "application/x-www-form-urlencoded", # As per docs, though params are in URL for GET
             "Authorization": get_access_token()
-        }, params=params)
+        }, params=params, timeout=_HTTP_TIMEOUT)
         response.raise_for_status()
-        content = response.json()
+        content = _response_json(response)
         
         # Assuming 'code' is an integer, typically 200 for success.
         # The API doc shows "code": {} which is unusual. Adjust if needed based on actual API behavior.
         api_code = content.get('code')
-        if isinstance(api_code, dict) and not api_code: # Handles "code": {}
+        if type(api_code) is int and api_code == 200:
+            pass  # Success, the common case; skip the format checks below
+        elif isinstance(api_code, dict) and not api_code: # Handles "code": {}
             # If code is an empty dict, assume success if data is present or no explicit error msg
             if "data" in content:
-                 print(f"DEBUG: query_device_data_history API response code is empty dict, assuming success. Content: {content!r}")
+                 logger.debug("query_device_data_history API response code is empty dict, assuming success. Content: %r", content)
             else: # No data and empty code dict might be an issue
                  error_msg = content.get('msg', 'Unknown API error with empty code object')
-                 print(f"DEBUG: query_device_data_history API error - Code: {api_code}, Msg: {error_msg}")
-                 return f"Error from API ({api_code}): {error_msg}"
+                 logger.debug("query_device_data_history API error - Code: %s, Msg: %s", api_code, error_msg)
+                 raise IoTApiError(f"API returned code {api_code}: {error_msg}")
         elif isinstance(api_code, int) and api_code != 200:
             error_msg = content.get('msg', 'Unknown API error')
-            print(f"DEBUG: query_device_data_history API error - Code: {api_code}, Msg: {error_msg}")
-            return f"Error from API ({api_code}): {error_msg}"
+            logger.debug("query_device_data_history API error - Code: %s, Msg: %s", api_code, error_msg)
+            raise IoTApiError(f"API returned code {api_code}: {error_msg}")
         # If 'code' is not an int and not an empty dict, it's an unexpected format
         elif not isinstance(api_code, int) and not (isinstance(api_code, dict) and not api_code) :
-            print(f"DEBUG: query_device_data_history API response has unexpected code format. Code: {api_code}, Content: {content!r}")
+            logger.debug("query_device_data_history API response has unexpected code format. Code: %s, Content: %r", api_code, content)
             # Fallback: check for 'data' presence as a loose success indicator
             if "data" not in content:
-                 return f"Error: API response has unexpected code format and no data. Code: {api_code}"
+                 raise IoTApiError(f"API response has unexpected code format and no data. Code: {api_code}")
 
 
         data_payload = content.get("data")
@@ -735,29 +1178,31 @@ def query_device_data_history(
             elif isinstance(total_items, int) and total_items == 0:
                 return {"data": [], "pagination": content} # Return empty list and pagination info
             
-            print(f"DEBUG: query_device_data_history API response has 'data' as None or not present. Full content: {content!r}")
+            logger.debug("query_device_data_history API response has 'data' as None or not present. Full content: %r", content)
             # Return the full content for the caller to inspect if data is missing but not an explicit error
             return content 
         
         # Return the whole content, as it includes pagination info (pageNum, pageSize, pages, total)
         return content
 
+    except IoTApiError:
+        raise
     except requests.exceptions.HTTPError as e:
-        print(f"ERROR: HTTP Error in query_device_data_history: {e}")
+        logger.error("HTTP Error in query_device_data_history: %s", e)
         if e.response is not None:
-            print(f"ERROR: Response status: {e.response.status_code}, Response content: {e.response.text}")
-        return f"Error: HTTP error {e.response.status_code if e.response else 'unknown'} while querying device data history: {e.response.text if e.response else str(e)}"
+            logger.error("Response status: %s, Response content: %s", e.response.status_code, e.response.text)
+        raise IoTApiError(f"HTTP error {e.response.status_code if e.response else 'unknown'} while querying device data history: {e.response.text if e.response else str(e)}") from e
     except requests.exceptions.RequestException as e:
-        print(f"ERROR: Network/Request Error in query_device_data_history: {e}")
-        return f"Error: Failed to query device data history due to network/request issue: {str(e)}"
+        logger.error("Network/Request Error in query_device_data_history: %s", e)
+        raise IoTApiError(f"Failed to query device data history due to network/request issue: {str(e)}") from e
     except ValueError as e: # Catches JSONDecodeError
-        print(f"ERROR: JSON Parsing Error in query_device_data_history: {str(e)}")
-        if 'response' in locals() and hasattr(response, 'text'):
-            print(f"ERROR: Response text that caused JSON parsing error: {response.text}")
-        return f"Error: Failed to parse JSON response from device data history API: {str(e)}"
+        logger.error("JSON Parsing Error in query_device_data_history: %s", e)
+        if response is not None:
+            logger.error("Response text that caused JSON parsing error: %s", response.text)
+        raise IoTApiError(f"Failed to parse JSON response from device data history API: {str(e)}") from e
     except Exception as e:
-        print(f"ERROR: Unexpected General Error in query_device_data_history: {str(e)}")
-        return f"Error: An unexpected error occurred while querying device data history: {str(e)}"
+        logger.error("Unexpected General Error in query_device_data_history: %s", e)
+        raise IoTApiError(f"An unexpected error occurred while querying device data history: {str(e)}") from e
 
 def query_device_event_history(
     product_key: str,
@@ -774,49 +1219,49 @@ def query_device_event_history(
     Query Device Historical Event Logs
     API: /v2/quecdatastorage/r1/openapi/device/eventdata/history
     """
-    base_url = os.environ.get('BASE_URL')
+    base_url = _base_url()
     url = f"{base_url}/v2/quecdatastorage/r1/openapi/device/eventdata/history"
 
+    # requests leaves None-valued params out of the query string
     params = {
         'productKey': product_key,
         'deviceKey': device_key,
         'language': language,
         'pageNum': page_num,
-        'pageSize': page_size
+        'pageSize': page_size,
+        'deviceId': device_id,
+        'beginDateTimp': begin_date_timp,
+        'endDateTimp': end_date_timp,
+        'eventType': event_type,
     }
-    if device_id is not None:
-        params['deviceId'] = device_id
-    if begin_date_timp is not None:
-        params['beginDateTimp'] = begin_date_timp
-    if end_date_timp is not None:
-        params['endDateTimp'] = end_date_timp
-    if event_type is not None:
-        params['eventType'] = event_type
 
+    response = None
     try:
-        response = requests.get(url, headers={
+        response = _SESSION.get(url, headers={
             "Content-Type": "application/x-www-form-urlencoded", # As per docs
             "Authorization": get_access_token()
-        }, params=params)
+        }, params=params, timeout=_HTTP_TIMEOUT)
         response.raise_for_status()
-        content = response.json()
+        content = _response_json(response)
 
         api_code = content.get('code')
-        if isinstance(api_code, dict) and not api_code: # Handles "code": {}
+        if type(api_code) is int and api_code == 200:
+            pass  # Success, the common case; skip the format checks below
+        elif isinstance(api_code, dict) and not api_code: # Handles "code": {}
             if "data" in content:
-                 print(f"DEBUG: query_device_event_history API response code is empty dict, assuming success. Content: {content!r}")
+                 logger.debug("query_device_event_history API response code is empty dict, assuming success. Content: %r", content)
             else:
                  error_msg = content.get('msg', 'Unknown API error with empty code object')
-                 print(f"DEBUG: query_device_event_history API error - Code: {api_code}, Msg: {error_msg}")
-                 return f"Error from API ({api_code}): {error_msg}"
+                 logger.debug("query_device_event_history API error - Code: %s, Msg: %s", api_code, error_msg)
+                 raise IoTApiError(f"API returned code {api_code}: {error_msg}")
         elif isinstance(api_code, int) and api_code != 200:
             error_msg = content.get('msg', 'Unknown API error')
-            print(f"DEBUG: query_device_event_history API error - Code: {api_code}, Msg: {error_msg}")
-            return f"Error from API ({api_code}): {error_msg}"
+            logger.debug("query_device_event_history API error - Code: %s, Msg: %s", api_code, error_msg)
+            raise IoTApiError(f"API returned code {api_code}: {error_msg}")
         elif not isinstance(api_code, int) and not (isinstance(api_code, dict) and not api_code) :
-            print(f"DEBUG: query_device_event_history API response has unexpected code format. Code: {api_code}, Content: {content!r}")
+            logger.debug("query_device_event_history API response has unexpected code format. Code: %s, Content: %r", api_code, content)
             if "data" not in content:
-                 return f"Error: API response has unexpected code format and no data. Code: {api_code}"
+                 raise IoTApiError(f"API response has unexpected code format and no data. Code: {api_code}")
 
         data_payload = content.get("data")
         if data_payload is None:
@@ -826,75 +1271,70 @@ def query_device_event_history(
             elif isinstance(total_items, int) and total_items == 0:
                 return {"data": [], "pagination": content}
             
-            print(f"DEBUG: query_device_event_history API response has 'data' as None or not present. Full content: {content!r}")
+            logger.debug("query_device_event_history API response has 'data' as None or not present. Full content: %r", content)
             return content
         
         return content
 
+    except IoTApiError:
+        raise
     except requests.exceptions.HTTPError as e:
-        print(f"ERROR: HTTP Error in query_device_event_history: {e}")
+        logger.error("HTTP Error in query_device_event_history: %s", e)
         if e.response is not None:
-            print(f"ERROR: Response status: {e.response.status_code}, Response content: {e.response.text}")
-        return f"Error: HTTP error {e.response.status_code if e.response else 'unknown'} while querying device event history: {e.response.text if e.response else str(e)}"
+            logger.error("Response status: %s, Response content: %s", e.response.status_code, e.response.text)
+        raise IoTApiError(f"HTTP error {e.response.status_code if e.response else 'unknown'} while querying device event history: {e.response.text if e.response else str(e)}") from e
     except requests.exceptions.RequestException as e:
-        print(f"ERROR: Network/Request Error in query_device_event_history: {e}")
-        return f"Error: Failed to query device event history due to network/request issue: {str(e)}"
+        logger.error("Network/Request Error in query_device_event_history: %s", e)
+        raise IoTApiError(f"Failed to query device event history due to network/request issue: {str(e)}") from e
     except ValueError as e: # Catches JSONDecodeError
-        print(f"ERROR: JSON Parsing Error in query_device_event_history: {str(e)}")
-        if 'response' in locals() and hasattr(response, 'text'):
-            print(f"ERROR: Response text that caused JSON parsing error: {response.text}")
-        return f"Error: Failed to parse JSON response from device event history API: {str(e)}"
+        logger.error("JSON Parsing Error in query_device_event_history: %s", e)
+        if response is not None:
+            logger.error("Response text that caused JSON parsing error: %s", response.text)
+        raise IoTApiError(f"Failed to parse JSON response from device event history API: {str(e)}") from e
     except Exception as e:
-        print(f"ERROR: Unexpected General Error in query_device_event_history: {str(e)}")
-        return f"Error: An unexpected error occurred while querying device event history: {str(e)}"
+        logger.error("Unexpected General Error in query_device_event_history: %s", e)
+        raise IoTApiError(f"An unexpected error occurred while querying device event history: {str(e)}") from e
+
+_AUTH_MODES = {0: "Dynamic Authentication", 1: "Static Authentication", 2: "X509 Authentication"}
+_DATA_FORMATS = {0: "Transparent Transmission", 3: "Thing Model"}
+_ACCESS_TYPES = {0: "Direct Device", 1: "Gateway Device", 2: "Gateway Sub-device"}
+_NETWORK_WAYS = {
+    '1': "WiFi",
+    '2': "Cellular (2G/3G/4G/5G)",
+    '3': "NB-IoT",
+    '4': "LoRa",
+    '5': "Ethernet",
+    '6': "Other",
+    None: "Not Specified",
+}
+
+def _code_label(labels, code):
+    """Label for a code, or None when unknown; unhashable codes (the API sends {} for some fields) are unknown"""
+    try:
+        return labels.get(code)
+    except TypeError:
+        return None
 
 def format_auth_mode(auth_mode_code):
     """Formats the authentication mode code into a human-readable string."""
-    if auth_mode_code == 0:
-        return "Dynamic Authentication"
-    elif auth_mode_code == 1:
-        return "Static Authentication"
-    elif auth_mode_code == 2:
-        return "X509 Authentication"
-    return f"Unknown ({auth_mode_code})"
+    return _code_label(_AUTH_MODES, auth_mode_code) or f"Unknown ({auth_mode_code})"
 
 def format_data_fmt(data_fmt_code):
     """Formats the data format code into a human-readable string."""
-    if data_fmt_code == 0:
-        return "Transparent Transmission"
-    elif data_fmt_code == 3:
-        return "Thing Model"
-    return f"Unknown ({data_fmt_code})"
+    return _code_label(_DATA_FORMATS, data_fmt_code) or f"Unknown ({data_fmt_code})"
 
 def format_access_type(access_type_code):
     """Formats the access type code into a human-readable string."""
-    if access_type_code == 0:
-        return "Direct Device"
-    elif access_type_code == 1:
-        return "Gateway Device"
-    elif access_type_code == 2:
-        return "Gateway Sub-device"
-    return f"Unknown ({access_type_code})"
+    return _code_label(_ACCESS_TYPES, access_type_code) or f"Unknown ({access_type_code})"
 
 def format_network_way(network_way_code):
     """Formats the network way code into a human-readable string."""
-    if network_way_code == '1':
-        return "WiFi"
-    elif network_way_code == '2':
-        return "Cellular (2G/3G/4G/5G)"
-    elif network_way_code == '3':
-        return "NB-IoT"
-    elif network_way_code == '4':
-        return "LoRa"
-    elif network_way_code == '5':
-        return "Ethernet"
-    elif network_way_code == '6':
-        return "Other"
-    elif network_way_code is None:
-        return "Not Specified"
-    return f"Unknown ({network_way_code})"
-
-def extract_latest_properties_from_history(product_key, device_key, max_records=30):
+    return _code_label(_NETWORK_WAYS, network_way_code) or f"Unknown ({network_way_code})"
+
+# Latest known value of one property, as found in the device's data history
+PropertySnapshot = namedtuple('PropertySnapshot', 'value timestamp formatted_time entry_id ticket raw_item')
+
+def extract_latest_properties_from_history(product_key, device_key, max_records=30, include_raw=True):
     """
     Efficiently extract latest property values from recent data history
     
@@ -902,59 +1342,72 @@ def extract_latest_properties_from_history(product_key, device_key, max_records=
         product_key: Product key
         device_key: Device key
         max_records: Maximum number of recent records to analyze (default: 30)
+        include_raw: Keep each property's parsed thingModelData item as raw_item
+            (default: True); pass False to let the parsed payloads be freed
     
     Returns:
-        dict: Latest property values with metadata
+        dict: Latest values under 'data', mapping property id to a PropertySnapshot,
+        plus analysis metadata
     """
     try:
         # Get recent uplink data
-        recent_data = query_device_data_history(
-            product_key=product_key,
-            device_key=device_key,
-            direction=1,  # Uplink only
-            page_size=max_records,
-            page_num=1,
-            language='CN'
-        )
+        try:
+            recent_data = query_device_data_history(
+                product_key=product_key,
+                device_key=device_key,
+                direction=1,  # Uplink only
+                page_size=max_records,
+                page_num=1,
+                language='CN'
+            )
+        except IoTApiError:
+            return {"error": "Failed to retrieve recent data", "data": None}
         
-        if isinstance(recent_data, str) or not isinstance(recent_data, dict):
+        if not isinstance(recent_data, dict):
             return {"error": "Failed to retrieve recent data", "data": None}
         
         data_entries = recent_data.get("data", [])
         if not data_entries:
             return {"error": "No recent data entries found", "data": None}
         
-        # Extract latest values for each property ID
-        latest_properties = {}
-        
+        # Extract latest values for each property ID. Walk entries newest first
+        # (the sort is stable, so ties keep response order) and let the first
+        # value seen for a property win.
+        entries = []
         for i, entry in enumerate(data_entries):
             if not isinstance(entry, dict):
-                print(f"DEBUG: Entry {i} is not a dict: {type(entry)} - {entry}")
+                logger.debug("Entry %s is not a dict: %s - %s", i, type(entry), entry)
                 continue  # Skip non-dict entries
-            create_time = entry.get('createTime', 0)
-            thing_model_data = entry.get('thingModelData', '[]')
+            entries.append(entry)
+        entries.sort(key=lambda entry: entry.get('createTime') or 0, reverse=True)
+        
+        latest_properties = {}
+        format_time = format_timestamp_with_timezone
+        
+        for entry in entries:
+            get = entry.get
+            create_time = get('createTime', 0)
+            thing_model_data = get('thingModelData', '[]')
             
             try:
-                import json
-                parsed_data = json.loads(thing_model_data) if isinstance(thing_model_data, str) else thing_model_data
+                parsed_data = _json_loads(thing_model_data) if isinstance(thing_model_data, str) else thing_model_data
                 
                 if isinstance(parsed_data, list):
                     for item in parsed_data:
                         if isinstance(item, dict) and 'id' in item:
                             prop_id = item['id']
-                            prop_value = item.get('value')
+                            if prop_id in latest_properties:
+                                continue  # A newer entry already supplied this property
                             
-                            # Only update if this is newer or we don't have this property yet
-                            if prop_id not in latest_properties or create_time > latest_properties[prop_id]['timestamp']:
-                                latest_properties[prop_id] = {
-                                    'value': prop_value,
-                                    'timestamp': create_time,
-                                    'formatted_time': format_timestamp_with_timezone(create_time),
-                                    'entry_id': entry.get('id'),
-                                    'ticket': entry.get('ticket'),
-                                    'raw_item': item
-                                }
-            except (json.JSONDecodeError, TypeError, KeyError):
+                            latest_properties[prop_id] = PropertySnapshot(
+                                item.get('value'),
+                                create_time,
+                                format_time(create_time),
+                                get('id'),
+                                get('ticket'),
+                                item if include_raw else None,
+                            )
+            except (ValueError, TypeError, KeyError):  # ValueError covers both parsers' JSONDecodeError
                 continue  # Skip invalid data
         
         return {
@@ -967,52 +1420,81 @@ def extract_latest_properties_from_history(product_key, device_key, max_records=
     except Exception as e:
         return {"error": f"Exception in extract_latest_properties_from_history: {str(e)}", "data": None}
 
-def get_property_summary_quick(product_key, device_key):
+# Property definitions built from each product's thing model, kept alongside the
+# thing model object they came from. Cached and revalidated thing models come back
+# as the same object, so an identity check tells when the definitions still apply.
+_PROPERTY_DEFINITIONS_MAXSIZE = 256
+_property_definitions_cache = {}
+_property_definitions_lock = threading.Lock()
+
+def _property_definitions(product_key, thing_model):
+    """Map property id to its name, code, unit, data type and range for a thing model"""
+    cached = _property_definitions_cache.get(product_key)
+    if cached is not None and cached[0] is thing_model:
+        return cached[1]
+    
+    property_definitions = {}
+    if isinstance(thing_model, dict) and 'properties' in thing_model:
+        for prop in thing_model['properties']:
+            if isinstance(prop, dict):  # Ensure prop is a dictionary
+                prop_id = prop.get('id')
+                if prop_id is not None:
+                    specs = prop.get('specs', {})
+                    unit = ''
+                    min_val = None
+                    max_val = None
+
+                    if isinstance(specs, dict):
+                        unit = specs.get('unit', '')
+                        min_val = specs.get('min')
+                        max_val = specs.get('max')
+                    elif isinstance(specs, list):
+                        unit = ''  # STRUCT type has list specs
+
+                    property_definitions[prop_id] = {
+                        'name': prop.get('name', 'Unknown'),
+                        'code': prop.get('code', 'unknown'),
+                        'unit': unit,
+                        'dataType': prop.get('dataType', 'UNKNOWN'),
+                        'range': {
+                            'min': min_val,
+                            'max': max_val
+                        }
+                    }
+    
+    if isinstance(thing_model, dict):
+        with _property_definitions_lock:
+            if product_key not in _property_definitions_cache and len(_property_definitions_cache) >= _PROPERTY_DEFINITIONS_MAXSIZE:
+                _property_definitions_cache.pop(next(iter(_property_definitions_cache)))
+            _property_definitions_cache[product_key] = (thing_model, property_definitions)
+    return property_definitions
+
+def get_property_summary_quick(product_key, device_key, thing_model_loader=None):
     """
     Quick summary of device properties (optimized for speed)
     
     Args:
         product_key: Product key
         device_key: Device key
+        thing_model_loader: Optional callable returning the product thing model,
+            e.g. a cached lookup (default: fetch it with get_product_thing_model)
     
     Returns:
         dict: Quick property summary
     """
+    if thing_model_loader is None:
+        thing_model_loader = lambda: get_product_thing_model(product_key=product_key, language='CN')
     try:
-        # Get property definitions
-        thing_model = get_product_thing_model(product_key=product_key, language='CN')
-        property_definitions = {}
-        
-        if isinstance(thing_model, dict) and 'properties' in thing_model:
-            for prop in thing_model['properties']:
-                if isinstance(prop, dict):  # Ensure prop is a dictionary
-                    prop_id = prop.get('id')
-                    if prop_id is not None:
-                        specs = prop.get('specs', {})
-                        unit = ''
-                        min_val = None
-                        max_val = None
-                        
-                        if isinstance(specs, dict):
-                            unit = specs.get('unit', '')
-                            min_val = specs.get('min')
-                            max_val = specs.get('max')
-                        elif isinstance(specs, list):
-                            unit = ''  # STRUCT type has list specs
-                        
-                        property_definitions[prop_id] = {
-                            'name': prop.get('name', 'Unknown'),
-                            'code': prop.get('code', 'unknown'),
-                            'unit': unit,
-                            'dataType': prop.get('dataType', 'UNKNOWN'),
-                            'range': {
-                                'min': min_val,
-                                'max': max_val
-                            }
-                        }
+        # Schema and history are independent; fetch the schema in the background
+        thing_model_future = _DETAIL_POOL.submit(thing_model_loader)
+        properties_result = extract_latest_properties_from_history(product_key, device_key, max_records=20, include_raw=False)
         
-        # Get latest property values
-        properties_result = extract_latest_properties_from_history(product_key, device_key, max_records=20)
+        # Get property definitions
+        try:
+            thing_model = thing_model_future.result()
+        except IoTApiError:
+            thing_model = None
+        property_definitions = _property_definitions(product_key, thing_model)
         
         if properties_result.get('error'):
             return {
@@ -1029,9 +1511,9 @@ def get_property_summary_quick(product_key, device_key):
             latest_data = latest_properties.get(prop_id)
             combined_properties[prop_id] = {
                 'definition': prop_def,
-                'latest_value': latest_data['value'] if latest_data else None,
-                'last_updated': latest_data['formatted_time'] if latest_data else None,
-                'timestamp': latest_data['timestamp'] if latest_data else None,
+                'latest_value': latest_data.value if latest_data is not None else None,
+                'last_updated': latest_data.formatted_time if latest_data is not None else None,
+                'timestamp': latest_data.timestamp if latest_data is not None else None,
                 'has_recent_data': latest_data is not None
             }
         
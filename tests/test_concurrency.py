@@ -0,0 +1,132 @@
+"""Tests for the server's single-flight TTL cache and util's background prefetch iterator"""
+import importlib.util
+import threading
+import time
+import unittest
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+
+def _load(name, filename):
+    spec = importlib.util.spec_from_file_location(name, SRC / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+server = _load("acc_mcp_server", "server.py")
+util = _load("acc_mcp_util", "util.py")
+
+
+class TTLCacheGetOrLoadTest(unittest.TestCase):
+    def _call_concurrently(self, cache, loader, workers=8):
+        """Call get_or_load from several threads at once; return (results, errors)"""
+        barrier = threading.Barrier(workers)
+        results, errors = [], []
+        lock = threading.Lock()
+
+        def call():
+            barrier.wait()
+            try:
+                value = cache.get_or_load("key", loader)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+            else:
+                with lock:
+                    results.append(value)
+
+        threads = [threading.Thread(target=call) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        return results, errors
+
+    def test_concurrent_misses_share_one_load(self):
+        cache = server._TTLCache(maxsize=4, ttl=60)
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.2)  # Keep the load in flight while the other threads miss
+            return {"value": 1}
+
+        results, errors = self._call_concurrently(cache, loader)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertIs(cache.get("key"), results[0])
+
+    def test_failure_reaches_every_waiter(self):
+        cache = server._TTLCache(maxsize=4, ttl=60)
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.2)
+            raise util.IoTApiError("boom")
+
+        results, errors = self._call_concurrently(cache, loader)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 8)
+        self.assertTrue(all(isinstance(e, util.IoTApiError) for e in errors))
+
+    def test_failure_is_not_cached(self):
+        cache = server._TTLCache(maxsize=4, ttl=60)
+
+        def failing():
+            raise util.IoTApiError("boom")
+
+        with self.assertRaises(util.IoTApiError):
+            cache.get_or_load("key", failing)
+        self.assertIsNone(cache.get("key"))
+
+        self.assertEqual(cache.get_or_load("key", lambda: "loaded"), "loaded")
+        self.assertEqual(cache.get_or_load("key", failing), "loaded")
+
+
+class PrefetchTest(unittest.TestCase):
+    def test_yields_items_in_order(self):
+        self.assertEqual(list(util._prefetch(iter(range(10)), depth=2)), list(range(10)))
+
+    def test_producer_error_is_reraised_after_earlier_items(self):
+        def source():
+            yield 1
+            yield 2
+            raise util.IoTApiError("page failed")
+
+        received = []
+        with self.assertRaises(util.IoTApiError):
+            for item in util._prefetch(source()):
+                received.append(item)
+        self.assertEqual(received, [1, 2])
+
+    def test_early_close_stops_producer_and_closes_source(self):
+        produced = []
+        closed = threading.Event()
+
+        def source():
+            try:
+                for i in range(1000):
+                    produced.append(i)
+                    yield i
+            finally:
+                closed.set()
+
+        items = util._prefetch(source(), depth=1)
+        self.assertEqual([next(items), next(items)], [0, 1])
+        items.close()
+
+        self.assertTrue(closed.wait(timeout=5))
+        # Two items consumed, one queued, one waiting to be queued when the stop came
+        self.assertLessEqual(len(produced), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()